@@ -1,6 +1,6 @@
 # BlogApp/admin.py
 from django.contrib import admin
-from .models import Post, Comment
+from .models import Post, Comment, Task
 
 class PostAdmin(admin.ModelAdmin):
     list_display = ('title', 'author', 'created_at')
@@ -12,5 +12,11 @@ class CommentAdmin(admin.ModelAdmin):
     list_filter = ('created_at',)
     search_fields = ('author__username', 'body')
 
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'priority', 'attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'idempotency_key', 'last_error')
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Comment, CommentAdmin)
+admin.site.register(Task, TaskAdmin)
@@ -0,0 +1,174 @@
+"""
+Post archives, read and written by `manage.py import_posts` and
+`manage.py export_posts`.
+
+There are two formats. Both are read and written one post at a time, so
+archives of any size use constant memory.
+
+* ``jsonl``: one JSON object per line::
+
+    {"id": 12, "author": "alice", "title": "...", "created_at": "2024-05-01T09:30:00+00:00",
+     "cover_image": "post_covers/x.jpg", "content": "..."}
+
+* ``markdown``: a directory with one ``.md`` file per post. Each file has
+  ``key: value`` front matter with the same keys, and the body follows it::
+
+    ---
+    title: ...
+    author: alice
+    created_at: 2024-05-01T09:30:00+00:00
+    ---
+
+    Body text.
+
+``cover_image`` is a media file name. Exports with media copy those files
+under ``media/`` next to the archive, which is also where imports look.
+"""
+import json
+import os
+import sys
+
+from django.utils.dateparse import parse_datetime
+from django.utils.text import slugify
+
+FIELDS = ('id', 'author', 'title', 'created_at', 'cover_image', 'content')
+FRONT_MATTER = '---'
+
+
+class ArchiveError(ValueError):
+    """A record in an archive can't be read."""
+
+
+def guess_format(path):
+    if path == '-' or path.endswith(('.jsonl', '.json')):
+        return 'jsonl'
+    return 'markdown'
+
+
+def media_dir(path):
+    """Where an archive's cover images live: media/ beside the file, or inside the directory."""
+    if path == '-':
+        return None
+    base = path if os.path.isdir(path) else os.path.dirname(os.path.abspath(path))
+    return os.path.join(base, 'media')
+
+
+def clean(record, where):
+    """Check a parsed record and turn created_at into a datetime."""
+    if not isinstance(record, dict):
+        raise ArchiveError(f'{where}: expected an object, not {type(record).__name__}')
+    missing = [key for key in ('author', 'title', 'content') if not record.get(key)]
+    if missing:
+        raise ArchiveError(f'{where}: missing {", ".join(missing)}')
+    for key in ('author', 'title', 'content', 'cover_image'):
+        if record.get(key) is not None and not isinstance(record[key], str):
+            raise ArchiveError(f'{where}: {key} is not a string')
+    created_at = record.get('created_at')
+    if created_at:
+        try:
+            record['created_at'] = parse_datetime(created_at) if isinstance(created_at, str) else None
+        except ValueError:
+            record['created_at'] = None
+        if record['created_at'] is None:
+            raise ArchiveError(f'{where}: bad created_at {created_at!r}')
+    return record
+
+
+# --- Reading ---
+
+def read_jsonl(path):
+    f = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise ArchiveError(f'{path}:{number}: {exc}') from exc
+            yield clean(record, f'{path}:{number}')
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def parse_markdown(text, where):
+    record = {}
+    lines = text.split('\n')
+    if lines and lines[0].strip() == FRONT_MATTER:
+        for end, line in enumerate(lines[1:], 1):
+            if line.strip() == FRONT_MATTER:
+                break
+            key, sep, value = line.partition(':')
+            if sep:
+                record[key.strip()] = value.strip()
+        else:
+            raise ArchiveError(f'{where}: front matter is not closed')
+        lines = lines[end + 1:]
+    record['content'] = '\n'.join(lines).strip('\n')
+    return clean(record, where)
+
+
+def read_markdown(path):
+    # Names are zero-padded source ids, so sorting keeps the export's order.
+    for name in sorted(os.listdir(path)):
+        if name.endswith('.md'):
+            with open(os.path.join(path, name), encoding='utf-8') as f:
+                yield parse_markdown(f.read(), name)
+
+
+def read_archive(path, format):
+    """Yield the archive's posts as dicts with the keys in FIELDS."""
+    return read_jsonl(path) if format == 'jsonl' else read_markdown(path)
+
+
+# --- Writing ---
+
+def record_for(pk, author, title, created_at, cover_image, content):
+    return {
+        'id': pk,
+        'author': author,
+        'title': title,
+        'created_at': created_at.isoformat(),
+        'cover_image': cover_image or None,
+        'content': content,
+    }
+
+
+def format_markdown(record):
+    lines = [FRONT_MATTER]
+    for key in FIELDS[:-1]:
+        if record[key] is not None:
+            lines.append(f'{key}: {record[key]}')
+    lines += [FRONT_MATTER, '', record['content'], '']
+    return '\n'.join(lines)
+
+
+class JsonlWriter:
+    def __init__(self, path):
+        self.file = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8')
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class MarkdownWriter:
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+
+    def write(self, record):
+        name = f"{record['id']:08d}-{slugify(record['title'])[:60] or 'post'}.md"
+        with open(os.path.join(self.path, name), 'w', encoding='utf-8') as f:
+            f.write(format_markdown(record))
+
+    def close(self):
+        pass
+
+
+def open_writer(path, format):
+    return JsonlWriter(path) if format == 'jsonl' else MarkdownWriter(path)
@@ -0,0 +1,77 @@
+"""
+Conditional GET (ETag / Last-Modified) for the read views.
+
+Views build their validators from rows they load anyway, such as the post
+with its revision, or the (id, updated_at) pairs of a list page. They
+then call conditional_response(). A request whose If-None-Match or
+If-Modified-Since still matches gets a 304 without rendering. This is the
+check django.views.decorators.http.condition() does, but it runs after the
+view's own async queries instead of in a separate sync ETag function.
+
+Pages differ per viewer (nav bar, vote buttons, follow state), so ETags
+include the viewer and responses Vary on Cookie. Pages with forms also
+include the visitor's CSRF secret: it changes on login, and a 304 would
+keep the old token in the form, whose POST then fails. Everything is sent with
+Cache-Control: no-cache: browsers and proxies keep a copy but revalidate it
+on every use. Shared caches only get the public, anonymous pages that
+contain no CSRF token.
+"""
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .models import Profile
+
+
+async def viewer_version(user):
+    """What identifies this viewer's variant of a page: anonymous, or who and their nav bar state."""
+    if not user.is_authenticated:
+        return ('anonymous',)
+    if 'profile' not in user._state.fields_cache:
+        profile = await Profile.objects.filter(user=user).afirst()
+        if profile is None:
+            return (user.pk, None)
+        user.profile = profile  # Cached for the nav bar, which shows the picture
+    return (user.pk, user.profile.updated_at, user.profile.groups_version)
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+async def conditional_response(request, parts, last_modified, build, csrf=False):
+    """
+    Return a 304 if the client's copy of the page described by ``parts``
+    is current, otherwise the response from ``await build()``. Either way,
+    add ETag, Last-Modified, Vary and Cache-Control. Pass ``csrf=True`` for
+    pages that render a CSRF token.
+    """
+    etag = None
+    # A 304 would swallow one-time flash messages, so those pages are always sent.
+    if not len(get_messages(request)):
+        if csrf:
+            parts = (*parts, request.META.get('CSRF_COOKIE'))
+        etag = make_etag(*parts, *await viewer_version(request.user))
+
+    response = None
+    if etag is not None:
+        response = get_conditional_response(
+            request, etag=etag,
+            last_modified=int(last_modified.timestamp()) if last_modified else None,
+        )
+    if response is None:
+        response = await build()
+
+    if etag is not None and response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault('Last-Modified', http_date(last_modified.timestamp()))
+    patch_vary_headers(response, ('Cookie',))
+    # Pages with a CSRF token in them are specific to the visitor too.
+    if request.user.is_authenticated or request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
@@ -0,0 +1,167 @@
+"""
+Materialized "following" timelines.
+
+Every reader has FeedEntry rows for the posts of the authors they follow.
+Rows are written when a post is published (fan-out on write) and when the
+reader follows or unfollows someone, so reading a timeline is one range scan
+of the (owner, created_at, post) index.
+
+Authors with more than BLOG_FEED_FANOUT_LIMIT followers are not fanned out;
+their posts are merged in at read time instead (hybrid fan-out).
+
+Fan-out and follow backfills run as background tasks (see tasks.py).
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Subquery
+
+from .models import AuthorStats, FeedEntry, Post, Profile
+from .pagination import KeysetPage, decode_cursor, encode_cursor, paginate_keyset
+from .tasks import task
+
+Follow = Profile.following.through
+
+FANOUT_BATCH_SIZE = 1000
+
+
+def is_popular(author_id):
+    """Popular authors' posts are pulled at read time rather than fanned out."""
+    return AuthorStats.objects.filter(
+        user_id=author_id, follower_count__gt=settings.BLOG_FEED_FANOUT_LIMIT
+    ).exists()
+
+
+def popular_followed_author_ids(user):
+    followed = Follow.objects.filter(from_profile__user=user).values('to_profile_id')
+    return list(
+        AuthorStats.objects.filter(
+            user__profile__in=Subquery(followed),
+            follower_count__gt=settings.BLOG_FEED_FANOUT_LIMIT,
+        ).values_list('user_id', flat=True)
+    )
+
+
+def _insert(entries):
+    FeedEntry.objects.bulk_create(entries, ignore_conflicts=True, batch_size=FANOUT_BATCH_SIZE)
+
+
+def fan_out(post):
+    """
+    Push a newly published post into the timeline of every follower of its author.
+    Returns the number of timelines written to.
+    """
+    return fan_out_posts([post])
+
+
+def fan_out_posts(posts):
+    """
+    fan_out() for many new posts at once (bulk imports): each author's
+    followers are read once for all of that author's posts. Returns the
+    number of entries written.
+    """
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+
+    total = 0
+    batch = []
+    for author_id, author_posts in by_author.items():
+        if is_popular(author_id):
+            continue
+        follower_ids = (
+            Follow.objects.filter(to_profile__user_id=author_id)
+            .values_list('from_profile__user_id', flat=True)
+            .iterator(chunk_size=FANOUT_BATCH_SIZE)
+        )
+        for owner_id in follower_ids:
+            batch.extend(
+                FeedEntry(owner_id=owner_id, post_id=post.pk, author_id=author_id, created_at=post.created_at)
+                for post in author_posts
+            )
+            if len(batch) >= FANOUT_BATCH_SIZE:
+                _insert(batch)
+                total += len(batch)
+                batch = []
+    if batch:
+        _insert(batch)
+        total += len(batch)
+    return total
+
+
+@task('feed.fan_out')
+def fan_out_task(post_id):
+    post = Post.objects.filter(pk=post_id).only('author_id', 'created_at').first()
+    if post is not None:
+        fan_out(post)
+
+
+def backfill(user_id, author_id):
+    """Copy the author's most recent posts into a reader's timeline after a follow."""
+    if is_popular(author_id):
+        return
+    recent = (
+        Post.objects.filter(author_id=author_id)
+        .order_by('-created_at', '-id')
+        .values_list('pk', 'created_at')[:settings.BLOG_FEED_BACKFILL]
+    )
+    _insert([
+        FeedEntry(owner_id=user_id, post_id=pk, author_id=author_id, created_at=created_at)
+        for pk, created_at in recent
+    ])
+
+
+@task('feed.backfill')
+def backfill_task(user_id, author_id):
+    # The reader may have unfollowed again before this ran.
+    if Follow.objects.filter(from_profile__user_id=user_id, to_profile__user_id=author_id).exists():
+        backfill(user_id, author_id)
+
+
+def schedule_fan_out(post):
+    fan_out_task.enqueue(post_id=post.pk, idempotency_key=f'feed.fan_out:{post.pk}')
+
+
+def schedule_backfill(user, author):
+    backfill_task.enqueue(user_id=user.pk, author_id=author.pk,
+                          idempotency_key=f'feed.backfill:{user.pk}:{author.pk}')
+
+
+def prune(user, author):
+    """Remove the author's posts from ``user``'s timeline after an unfollow."""
+    FeedEntry.objects.filter(owner=user, author=author).delete()
+
+
+def timeline_page(user, cursor=None, per_page=10):
+    """
+    Return a KeysetPage of posts for ``user``'s timeline, newest first.
+    Cursors are in (created_at, post id) space, so they work across both
+    the materialized entries and the read-time posts of popular authors.
+    """
+    if cursor:
+        decode_cursor(cursor)  # Raise InvalidCursor before touching the database
+
+    entries = paginate_keyset(
+        FeedEntry.objects.filter(owner=user).only('post_id', 'created_at'),
+        cursor=cursor, per_page=per_page, id_field='post_id',
+    )
+    keys = {(entry.created_at, entry.post_id) for entry in entries}
+    has_more = entries.has_next
+
+    popular = popular_followed_author_ids(user)
+    if popular:
+        pulled = paginate_keyset(
+            Post.objects.filter(author_id__in=popular).only('created_at'),
+            cursor=cursor, per_page=per_page,
+        )
+        keys.update((post.created_at, post.pk) for post in pulled)
+        has_more = has_more or pulled.has_next
+
+    keys = sorted(keys, reverse=True)
+    page_keys = keys[:per_page]
+    next_cursor = None
+    if page_keys and (has_more or len(keys) > per_page):
+        next_cursor = encode_cursor(*page_keys[-1])
+
+    posts = Post.objects.for_listing().in_bulk([pk for _, pk in page_keys])
+    return KeysetPage([posts[pk] for _, pk in page_keys if pk in posts], next_cursor)
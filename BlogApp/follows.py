@@ -0,0 +1,164 @@
+"""
+The follower graph: follow/unfollow and "who to follow" suggestions.
+
+Follows are rows in the Profile.following through table. toggle_follow()
+changes one row and the follower/following counts in AuthorStats in one
+transaction, without first checking whether the row exists.
+
+Suggestions are computed offline by `manage.py compute_follow_suggestions`.
+The whole graph is loaded into compact adjacency arrays (CSR: one offsets
+array and one targets array per direction, indexed by profile id), so even
+millions of edges are a few machine integers each instead of model
+instances. For each user, candidates are scored by
+
+* friends of friends: one point per account they follow that follows the
+  candidate, and
+* co-follows: one point per follower of theirs who also follows the
+  candidate.
+
+Accounts the user already follows are left out. The best
+BLOG_FOLLOW_SUGGESTIONS are stored in the user's FollowSuggestion row, which
+the profile page reads with one primary-key lookup.
+"""
+import heapq
+from array import array
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from . import stats
+from .models import FollowSuggestion, Profile
+
+Follow = Profile.following.through
+
+
+def toggle_follow(follower, author):
+    """
+    Follow ``author`` (a user with their profile loaded), or unfollow if
+    ``follower`` already does. Returns True if ``follower`` follows them now.
+    """
+    with transaction.atomic():
+        removed, _ = Follow.objects.filter(
+            from_profile_id=follower.profile.pk, to_profile_id=author.profile.pk
+        ).delete()
+        if removed:
+            delta = -1
+        else:
+            try:
+                with transaction.atomic():
+                    Follow.objects.create(from_profile_id=follower.profile.pk, to_profile_id=author.profile.pk)
+            except IntegrityError:
+                return True  # A concurrent request followed them first
+            delta = 1
+        stats.adjust(stats.for_user(author.pk), follower_count=delta)
+        stats.adjust(stats.for_user(follower.pk), following_count=delta)
+    return delta > 0
+
+
+# --- Suggestions ---
+
+class FollowGraph:
+    """
+    Follow edges between profile ids in CSR form::
+
+        following of p: targets[offsets[p]:offsets[p + 1]]
+        followers of p: sources[in_offsets[p]:in_offsets[p + 1]]
+    """
+    def __init__(self, edges, size):
+        self.size = size
+        self.offsets, self.targets = self._csr(edges, size, 0)
+        self.in_offsets, self.sources = self._csr(edges, size, 1)
+
+    @staticmethod
+    def _csr(edges, size, key):
+        """Counting sort of (source, target) pairs on edges[key]."""
+        src, dst = edges
+        keys, values = (src, dst) if key == 0 else (dst, src)
+        offsets = array('q', bytes(8 * (size + 1)))
+        for node in keys:
+            offsets[node + 1] += 1
+        for node in range(size):
+            offsets[node + 1] += offsets[node]
+        position = array('q', offsets)
+        out = array('q', bytes(8 * len(keys)))
+        for node, value in zip(keys, values):
+            out[position[node]] = value
+            position[node] += 1
+        return offsets, out
+
+    @classmethod
+    def load(cls, batch_size=10000):
+        """Read every follow edge, streaming the through table."""
+        src, dst = array('q'), array('q')
+        rows = Follow.objects.values_list('from_profile_id', 'to_profile_id').iterator(chunk_size=batch_size)
+        for from_id, to_id in rows:
+            src.append(from_id)
+            dst.append(to_id)
+        size = max(max(src, default=0), max(dst, default=0)) + 1
+        return cls((src, dst), size)
+
+    def following(self, node):
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def followers(self, node):
+        return self.sources[self.in_offsets[node]:self.in_offsets[node + 1]]
+
+    def suggest(self, node, limit):
+        """The ``limit`` best (candidate, score) pairs for ``node``, best first."""
+        if node >= self.size:
+            return []
+        followed = set(self.following(node))
+        scores = Counter()
+        for friend in followed:
+            scores.update(self.following(friend))
+        for follower in self.followers(node):
+            scores.update(self.following(follower))
+        for excluded in followed | {node}:
+            scores.pop(excluded, None)
+        # Ties go to the lower (older) profile id, so results are stable.
+        return heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def compute_suggestions(batch_size=1000, limit=None):
+    """
+    Recompute and store every user's suggestions. Returns the number of
+    users processed.
+    """
+    limit = limit or settings.BLOG_FOLLOW_SUGGESTIONS
+    graph = FollowGraph.load()
+    profiles = Profile.objects.order_by('pk').values_list('pk', 'user_id').iterator(chunk_size=batch_size)
+
+    total = 0
+    batch = []
+    for profile_id, user_id in profiles:
+        batch.append((profile_id, user_id))
+        if len(batch) >= batch_size:
+            _store(graph, batch, limit)
+            total += len(batch)
+            batch = []
+    if batch:
+        _store(graph, batch, limit)
+        total += len(batch)
+    return total
+
+
+def _store(graph, batch, limit):
+    picks = {user_id: graph.suggest(profile_id, limit) for profile_id, user_id in batch}
+    # Usernames are stored with the suggestions, so showing them needs no join.
+    candidates = {candidate for pairs in picks.values() for candidate, _ in pairs}
+    users = {
+        profile_id: (user_id, username)
+        for profile_id, user_id, username in Profile.objects.filter(pk__in=candidates)
+        .values_list('pk', 'user_id', 'user__username')
+    }
+    rows = [
+        FollowSuggestion(user_id=user_id, suggestions=[
+            {'id': users[candidate][0], 'username': users[candidate][1], 'score': score}
+            for candidate, score in pairs if candidate in users
+        ])
+        for user_id, pairs in picks.items()
+    ]
+    FollowSuggestion.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['user'], update_fields=['suggestions', 'computed_at'],
+    )
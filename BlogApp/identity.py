@@ -0,0 +1,99 @@
+"""
+Who a request is for, without extra queries per request.
+
+* ProfileBackend loads the session's user with their Profile joined in,
+  so ``request.user.profile`` costs nothing.
+* IdentityMiddleware (middleware.py) sets ``request.profile`` lazily from
+  that join.
+* group_names() keeps the user's group names in their session, stored at
+  login and stamped with Profile.groups_version. Signals bump that version
+  whenever the user's groups change (signals.py), so a stale list is never
+  used.
+"""
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.shortcuts import redirect
+from django.utils.functional import SimpleLazyObject
+
+from .models import Profile
+
+WRITERS = 'Writers'
+SESSION_KEY = '_blog_groups'
+
+
+class ProfileBackend(ModelBackend):
+    """ModelBackend that fetches the user and their profile in one query."""
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.select_related('profile').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = await UserModel._default_manager.select_related('profile').aget(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+
+def get_profile(user):
+    """The user's Profile: from ProfileBackend's join, else loaded (or created) once."""
+    if not user.is_authenticated:
+        return None
+    try:
+        return user.profile
+    except Profile.DoesNotExist:
+        user.profile, _ = Profile.objects.get_or_create(user=user)
+        return user.profile
+
+
+def lazy_profile(request):
+    return SimpleLazyObject(lambda: get_profile(request.user))
+
+
+def group_names(request):
+    """Names of the request user's groups, from the session while their version is current."""
+    if not request.user.is_authenticated:
+        return frozenset()
+    if not hasattr(request, '_group_names'):
+        cached = request.session.get(SESSION_KEY)
+        if cached and cached[0] == get_profile(request.user).groups_version:
+            request._group_names = frozenset(cached[1])
+        else:
+            remember_groups(request, request.user)
+    return request._group_names
+
+
+def remember_groups(request, user):
+    """Store the user's current group names in the session (done at login, and when stale)."""
+    # The version is read from the table: a user object kept in memory since
+    # before its groups changed carries an old one.
+    version = Profile.objects.filter(user=user).values_list('groups_version', flat=True).first()
+    names = list(user.groups.values_list('name', flat=True))
+    request.session[SESSION_KEY] = [version, names]
+    request._group_names = frozenset(names)
+
+
+def is_writer(request):
+    return WRITERS in group_names(request)
+
+
+def writer_required(view_func):
+    """Send everyone who isn't a writer to the post list."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not is_writer(request):
+            return redirect('post_list')
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+def context_processor(request):
+    """``is_writer`` for templates (the nav bar's writer links)."""
+    return {'is_writer': SimpleLazyObject(lambda: is_writer(request))}
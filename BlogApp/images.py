@@ -0,0 +1,157 @@
+"""
+Responsive image variants.
+
+After a cover image or profile picture is uploaded, resized WebP and JPEG
+copies are generated by a background task and recorded on the model as::
+
+    {'source': 'post_covers/x.jpg', 'width': 4000,
+     'webp': {'320': 'variants/post_covers/x-320w.webp', ...},
+     'jpeg': {'320': 'variants/post_covers/x-320w.jpg', ...}}
+
+Templates turn that into <picture>/srcset markup with the
+{% responsive_image %} tag (templatetags/blog_images.py).
+"""
+import os
+import threading
+from io import BytesIO
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .tasks import task
+
+# Widths generated per image field; chosen from the CSS sizes at 1x and 2x.
+VARIANT_WIDTHS = {
+    'cover_image': (320, 480, 960, 1280),
+    'profile_pic': (80, 160, 320),
+}
+
+# PIL format, extension, save options, and whether the format keeps transparency.
+FORMATS = {
+    'webp': ('WEBP', '.webp', {'quality': 80, 'method': 4}, True),
+    'jpeg': ('JPEG', '.jpg', {'quality': 82, 'optimize': True, 'progressive': True}, False),
+}
+
+# Which model field records the variants of which image field.
+VARIANTS_FIELDS = {
+    'cover_image': 'cover_variants',
+    'profile_pic': 'pic_variants',
+}
+
+# Locks striped by source file name, so two threads never write the same
+# variant names. A fixed pool: unrelated files may share a lock, but the
+# number of locks doesn't grow with the number of files seen.
+_source_locks = [threading.Lock() for _ in range(64)]
+
+
+def _source_lock(name):
+    return _source_locks[hash(name) % len(_source_locks)]
+
+
+def variant_name(source_name, width, extension):
+    stem, _ = os.path.splitext(source_name)
+    return f'variants/{stem}-{width}w{extension}'
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+
+
+def flatten(image, background='white'):
+    """``image`` as RGB, with any transparent areas composited onto ``background``."""
+    if not has_alpha(image):
+        return image.convert('RGB')
+    image = image.convert('RGBA')
+    flat = Image.new('RGB', image.size, background)
+    flat.paste(image, mask=image.getchannel('A'))
+    return flat
+
+
+def generate_variants(field_file, widths, force=False):
+    """
+    Write resized copies of ``field_file`` for every width smaller than the
+    original (plus the original width itself) and return the variants dict.
+    Existing variants newer than the source are reused unless ``force``.
+    """
+    with _source_lock(field_file.name):
+        return _generate_variants(field_file, widths, force)
+
+
+def _generate_variants(field_file, widths, force):
+    storage = field_file.storage
+    source_modified = storage.get_modified_time(field_file.name)
+    with field_file.open('rb') as f:
+        image = ImageOps.exif_transpose(Image.open(f))
+        # JPEG has no alpha channel: transparent areas become white, not black.
+        opaque = flatten(image)
+        image = image.convert('RGBA') if has_alpha(image) else opaque
+
+    original_width = image.width
+    sizes = [w for w in widths if w < original_width] + [min(original_width, max(widths))]
+    variants = {'source': field_file.name, 'width': original_width}
+
+    for key, (pil_format, extension, options, keeps_alpha) in FORMATS.items():
+        variants[key] = {}
+        for width in sorted(set(sizes)):
+            name = variant_name(field_file.name, width, extension)
+            if storage.exists(name):
+                if not force and storage.get_modified_time(name) >= source_modified:
+                    # Shared sources (the default profile picture) are only resized once.
+                    variants[key][str(width)] = name
+                    continue
+                storage.delete(name)
+
+            resized = (image if keeps_alpha else opaque).copy()
+            resized.thumbnail((width, width * 10), Image.LANCZOS)
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **options)
+            variants[key][str(width)] = storage.save(name, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def needs_variants(instance, field_name):
+    file = getattr(instance, field_name)
+    variants = getattr(instance, VARIANTS_FIELDS[field_name])
+    if not file:
+        return bool(variants)
+    return variants.get('source') != file.name
+
+
+def update_variants(model, pk, field_name, force=False):
+    """
+    Generate and store the variants for one row. The result is only written
+    if the image wasn't replaced again while we were working. ``force``
+    rewrites variant files that look up to date.
+    """
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    file = getattr(instance, field_name)
+    rows = model.objects.filter(pk=pk)
+    if file:
+        variants = generate_variants(file, VARIANT_WIDTHS[field_name], force=force)
+        rows = rows.filter(**{field_name: file.name})
+    else:
+        variants = {}
+    rows.update(updated_at=timezone.now(), **{VARIANTS_FIELDS[field_name]: variants})
+
+
+@task('images.update_variants', max_attempts=3)
+def update_variants_task(model, pk, field_name):
+    update_variants(apps.get_model(model), pk, field_name)
+
+
+def schedule_variants(instance, field_name):
+    """
+    Queue variant generation for ``instance`` if its image changed since
+    the variants were last made.
+    """
+    if needs_variants(instance, field_name):
+        file = getattr(instance, field_name)
+        label = instance._meta.label
+        update_variants_task.enqueue(
+            model=label, pk=instance.pk, field_name=field_name,
+            idempotency_key=f'images:{label}:{instance.pk}:{file.name or ""}',
+        )
@@ -0,0 +1,35 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from BlogApp import stats
+from BlogApp.models import Profile
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the Profile and AuthorStats rows of users that have none '
+        '(e.g. created with bulk_create or before profiles existed).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        missing = list(User.objects.filter(profile__isnull=True).values_list('pk', flat=True))
+        for start in range(0, len(missing), batch_size):
+            Profile.objects.bulk_create(
+                [Profile(user_id=user_id) for user_id in missing[start:start + batch_size]],
+                ignore_conflicts=True,
+            )
+
+        # Users may already have posts and followers, so stats are computed, not zeroed.
+        missing_stats = list(User.objects.filter(author_stats__isnull=True).values_list('pk', flat=True))
+        stats.recompute(user_ids=missing_stats, batch_size=batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(missing)} profiles and {len(missing_stats)} stats rows.'
+        ))
+        if missing:
+            self.stdout.write('Run `manage.py generate_image_variants` for their profile pictures.')
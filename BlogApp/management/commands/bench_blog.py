@@ -0,0 +1,202 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from BlogApp import urls as blog_urls
+from BlogApp.models import Post
+
+# Extra request details per URL name; every other pattern is a plain GET.
+# Toggling POSTs are sent an even number of times in total, so the data ends
+# up as it was.
+SCENARIOS = {
+    'search_results': {'query': {'q': 'python cache'}},
+    'check_username': {'query': {'username': 'someone-new'}},
+    'post_vote': {'method': 'post', 'data': {'vote': 'like'}, 'toggle': True},
+    'follow_user': {'method': 'post', 'toggle': True},
+    # Logging out ends the session, so the client logs back in after each run.
+    'logout': {'relogin': True},
+}
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Request every URL in BlogApp/urls.py through the test client and report '
+        'p50/p99 latency, query count and peak memory (run seed_blog first).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Timed requests per URL.')
+        parser.add_argument('--warmup', type=int, default=2,
+                            help='Untimed requests per URL before measuring.')
+        parser.add_argument('--user', help='Username to log in as (default: the busiest author).')
+        parser.add_argument('--anonymous', action='store_true', help='Run without logging in.')
+        parser.add_argument('--cold-cache', action='store_true',
+                            help='Clear the cache before every request.')
+        parser.add_argument('--only', nargs='*', default=None, help='URL names to run.')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+        parser.add_argument('--compare', help='A previous --output file to compare against.')
+
+    def handle(self, *args, **options):
+        user = self.bench_user(options)
+        self.client = Client()
+        self.user = None if options['anonymous'] else user
+        self.login()
+
+        post = self.sample_post(user)
+        if post is None:
+            raise CommandError(f'{user.username!r} has no posts to benchmark; pick another --user.')
+        author = self.sample_author()
+        if author is None:
+            raise CommandError('No other user to benchmark profile pages with; run `manage.py seed_blog` first.')
+        samples = {'pk': post.pk, 'username': author.username}
+
+        results = []
+        for pattern in blog_urls.urlpatterns:
+            if not isinstance(pattern, URLPattern) or not pattern.name:
+                continue
+            if options['only'] is not None and pattern.name not in options['only']:
+                continue
+            kwargs = {name: samples[name] for name in pattern.pattern.converters}
+            result = self.bench(pattern.name, reverse(pattern.name, kwargs=kwargs), options)
+            results.append(result)
+            self.stdout.write(
+                f"{result['name']:<18} {result['method']:<5} {result['status']:>4}  "
+                f"p50 {result['p50_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  "
+                f"{result['queries']:>4} queries  {result['peak_kb']:>8.1f} KB"
+            )
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'iterations': options['iterations'],
+            'user': self.user.username if self.user else None,
+            'cold_cache': options['cold_cache'],
+            'rows': {
+                'users': User.objects.count(),
+                'posts': Post.objects.count(),
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        if options['compare']:
+            self.compare(options['compare'], results)
+
+    def bench_user(self, options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user named {options['user']!r}")
+            return user
+        busiest = (
+            Post.objects.values('author_id').annotate(n=Count('pk')).order_by('-n').first()
+        )
+        if busiest is None:
+            raise CommandError('No posts to benchmark; run `manage.py seed_blog` first.')
+        return User.objects.get(pk=busiest['author_id'])
+
+    def sample_post(self, user):
+        # The user's most-commented post, so edit/delete pages are reachable too.
+        return Post.objects.filter(author=user).order_by('-comment_count', '-pk').first()
+
+    def sample_author(self):
+        return (
+            User.objects.exclude(pk=getattr(self.user, 'pk', None))
+            .order_by('-author_stats__follower_count', 'pk').first()
+        )
+
+    def login(self):
+        if self.user is not None:
+            self.client.force_login(self.user)
+
+    def request(self, url, scenario):
+        method = scenario.get('method', 'get')
+        if method == 'get':
+            return self.client.get(url, scenario.get('query', {}))
+        return self.client.post(url, scenario.get('data', {}))
+
+    def bench(self, name, url, options):
+        scenario = SCENARIOS.get(name, {})
+
+        def prepare():
+            if scenario.get('relogin'):
+                self.login()
+            if options['cold_cache']:
+                cache.clear()
+
+        for _ in range(options['warmup']):
+            prepare()
+            self.request(url, scenario)
+
+        timings = []
+        queries = []
+        status = None
+        for _ in range(options['iterations']):
+            prepare()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = self.request(url, scenario)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(captured))
+            status = response.status_code
+
+        # Memory is traced in a separate request; tracing slows the timed ones down.
+        prepare()
+        tracemalloc.start()
+        try:
+            self.request(url, scenario)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        if scenario.get('toggle') and (options['warmup'] + options['iterations'] + 1) % 2:
+            self.request(url, scenario)
+        if scenario.get('relogin'):
+            self.login()
+
+        return {
+            'name': name,
+            'url': url,
+            'method': scenario.get('method', 'get').upper(),
+            'status': status,
+            'p50_ms': round(statistics.median(timings), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'queries': max(queries),
+            'peak_kb': round(peak / 1024, 1),
+        }
+
+    def compare(self, path, results):
+        with open(path) as f:
+            previous = {result['name']: result for result in json.load(f)['results']}
+        self.stdout.write(f'\nCompared with {path}:')
+        for result in results:
+            before = previous.get(result['name'])
+            if before is None:
+                continue
+            change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+            self.stdout.write(
+                f"{result['name']:<18} p50 {before['p50_ms']:8.2f} -> {result['p50_ms']:8.2f} ms ({change:+.0f}%)  "
+                f"queries {before['queries']} -> {result['queries']}"
+            )
@@ -0,0 +1,50 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from whitenoise.compress import Compressor
+
+from BlogApp import media
+from BlogApp.models import media_storage
+from BlogApp.storage import TMP_DIR
+
+
+class Command(BaseCommand):
+    help = (
+        'Write Brotli and gzip copies of uploaded files that compress well, for '
+        'MediaMiddleware to serve. Images already stored compressed (JPEG, PNG, '
+        'WebP, ...) are skipped, as are files whose copies are up to date.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.BLOG_IMAGE_WORKERS,
+                            help='Files compressed in parallel.')
+
+    def handle(self, *args, **options):
+        root = media_storage().location
+        compressor = Compressor(quiet=True)
+        paths = [
+            path for path in self.files(root, os.path.join(root, TMP_DIR))
+            if compressor.should_compress(path) and not self.is_current(path)
+        ]
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            written = sum(len(copies) for copies in pool.map(compressor.compress, paths))
+        self.stdout.write(self.style.SUCCESS(f'Checked {len(paths)} files; wrote {written} compressed copies.'))
+
+    def files(self, root, skip):
+        for directory, dirs, files in os.walk(root):
+            if directory == skip:
+                dirs.clear()
+                continue
+            for file in files:
+                if not file.endswith(media.COMPRESSED_SUFFIXES):
+                    yield os.path.join(directory, file)
+
+    def is_current(self, path):
+        # Copies get the mtime of their source; see Compressor.write_data().
+        mtime = os.path.getmtime(path)
+        return any(
+            os.path.exists(path + suffix) and os.path.getmtime(path + suffix) == mtime
+            for suffix in media.COMPRESSED_SUFFIXES
+        )
@@ -0,0 +1,23 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from BlogApp import follows
+
+
+class Command(BaseCommand):
+    help = 'Recompute every user\'s "who to follow" suggestions from the whole follower graph.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=settings.BLOG_FOLLOW_SUGGESTIONS,
+                            help='Suggestions stored per user.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Users whose suggestions are written per query.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        total = follows.compute_suggestions(batch_size=options['batch_size'], limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored suggestions for {total} users in {time.perf_counter() - start:.1f}s.'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from BlogApp import trending
+
+
+class Command(BaseCommand):
+    help = 'Rescore the trending posts for their current age (run every few minutes, e.g. from cron).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Posts rescored per UPDATE.')
+
+    def handle(self, *args, **options):
+        total = trending.decay(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rescored {total} posts.'))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template.defaultfilters import filesizeformat
+
+from BlogApp import images, media
+from BlogApp.models import media_storage
+from BlogApp.storage import BLOB_DIR
+
+
+class Command(BaseCommand):
+    help = (
+        'Move images uploaded before content-addressed storage into it, so '
+        'identical files are stored once, and point their posts and profiles '
+        'at the new names. Variants are regenerated for the new names.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete-originals', action='store_true',
+                            help='Delete the old files and their variants once nothing refers to them.')
+
+    def handle(self, *args, **options):
+        storage = media_storage()
+        moved = freed = 0
+        blobs = set()
+        for model, fields in media.MEDIA_FIELDS.items():
+            for field in fields:
+                default = model._meta.get_field(field).default
+                names = (
+                    model.objects.exclude(**{f'{field}__startswith': f'{BLOB_DIR}/'})
+                    .exclude(**{f'{field}__isnull': True}).exclude(**{field: ''}).exclude(**{field: default})
+                    .values_list(field, flat=True).distinct().order_by()
+                )
+                for name in list(names):
+                    if not storage.exists(name):
+                        self.stderr.write(f'{model.__name__}.{field} {name!r} is missing; left as is.')
+                        continue
+                    size = storage.size(name)
+                    with storage.open(name, 'rb') as f:
+                        new = storage.save(name, f)
+                    with transaction.atomic():
+                        rows = model.objects.filter(**{field: name})
+                        count = rows.update(**{field: new})
+                        media.adjust_refs({new: count})
+                    for instance in model.objects.filter(**{field: new}).only(field, images.VARIANTS_FIELDS[field]):
+                        images.schedule_variants(instance, field)
+
+                    moved += 1
+                    blobs.add(new)
+                    if options['delete_originals']:
+                        media.delete_file(storage, name)
+                        media.delete_variants(storage, name)
+                        freed += size
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {moved} files into {len(blobs)} distinct blobs; '
+            f'deleted {filesizeformat(freed)} of originals.'
+        ))
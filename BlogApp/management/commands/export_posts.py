@@ -0,0 +1,79 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from BlogApp import archives
+from BlogApp.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Write posts to a JSONL file (or - for stdout) or a directory of Markdown '
+        'files, streaming them from the database in batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='A .jsonl file, - for stdout, or a directory for Markdown.')
+        parser.add_argument('--format', choices=('jsonl', 'markdown'),
+                            help='Default: jsonl for .jsonl/.json paths and -, otherwise markdown.')
+        parser.add_argument('--author', action='append', default=[],
+                            help='Only export posts by this username (repeatable).')
+        parser.add_argument('--include-media', action='store_true',
+                            help='Copy cover images to media/ beside the archive.')
+        parser.add_argument('--workers', type=int, default=settings.BLOG_IMAGE_WORKERS,
+                            help='Cover images copied in parallel.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or archives.guess_format(path)
+        if path == '-' and format != 'jsonl':
+            raise CommandError('Only JSONL can be written to stdout.')
+        if path == '-' and options['include_media']:
+            raise CommandError('--include-media needs an archive path.')
+
+        posts = Post.objects.order_by('pk')
+        if options['author']:
+            posts = posts.filter(author__username__in=options['author'])
+        rows = posts.values_list(
+            'pk', 'author__username', 'title', 'created_at', 'cover_image', 'content',
+        ).iterator(chunk_size=options['batch_size'])
+
+        writer = archives.open_writer(path, format)
+        media_dir = archives.media_dir(path) if options['include_media'] else None
+        exported = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            copies = []
+            try:
+                for row in rows:
+                    record = archives.record_for(*row)
+                    writer.write(record)
+                    exported += 1
+                    if media_dir and record['cover_image']:
+                        copies.append(pool.submit(self.copy_cover, record['cover_image'], media_dir))
+                        if len(copies) >= options['batch_size']:
+                            self.wait(copies)
+            finally:
+                writer.close()
+            self.wait(copies)
+
+        if path != '-':
+            self.stdout.write(self.style.SUCCESS(f'Exported {exported} posts to {path}.'))
+
+    def copy_cover(self, name, media_dir):
+        target = os.path.join(media_dir, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        storage = Post._meta.get_field('cover_image').storage
+        with storage.open(name, 'rb') as source, open(target, 'wb') as f:
+            shutil.copyfileobj(source, f)
+
+    def wait(self, copies):
+        for copy in copies:
+            try:
+                copy.result()
+            except OSError as exc:
+                self.stderr.write(f'Cover image not copied: {exc}')
+        copies.clear()
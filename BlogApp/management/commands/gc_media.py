@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from BlogApp import media
+from BlogApp.models import media_storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete uploaded images (and their variants) that no post or profile refers '
+        'to any more. Run daily, e.g. from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recount', action='store_true',
+                            help='Recount references from the posts and profiles first.')
+        parser.add_argument('--grace-hours', type=float, default=settings.BLOG_MEDIA_GC_GRACE_HOURS,
+                            help='Keep files uploaded more recently than this.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report what would be deleted.')
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            fixed = media.recount_refs()
+            self.stdout.write(f'Corrected {fixed} reference counts.')
+        deleted, freed = media.collect_garbage(
+            media_storage(), timedelta(hours=options['grace_hours']), dry_run=options['dry_run'],
+        )
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {deleted} files ({filesizeformat(freed)}).'))
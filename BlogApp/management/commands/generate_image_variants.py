@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from BlogApp import images
+from BlogApp.models import Post, Profile
+
+
+class Command(BaseCommand):
+    help = 'Generate missing responsive variants for existing cover images and profile pictures.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.BLOG_IMAGE_WORKERS,
+                            help='Number of images processed in parallel.')
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate variants even if they are up to date.')
+
+    def handle(self, *args, **options):
+        jobs = []
+        forced = set()
+        for model, field_name in ((Post, 'cover_image'), (Profile, 'profile_pic')):
+            rows = model.objects.exclude(**{f'{field_name}__isnull': True}).exclude(**{field_name: ''})
+            for instance in rows.only(field_name, images.VARIANTS_FIELDS[field_name]).iterator():
+                if options['force']:
+                    # Shared sources (the default profile picture) are rewritten once.
+                    name = getattr(instance, field_name).name
+                    jobs.append((model, instance.pk, field_name, name not in forced))
+                    forced.add(name)
+                elif images.needs_variants(instance, field_name):
+                    jobs.append((model, instance.pk, field_name, False))
+
+        def run(job):
+            model, pk, field_name, force = job
+            try:
+                images.update_variants(model, pk, field_name, force=force)
+                return None
+            except Exception as exc:
+                return f'{model.__name__} {pk}: {exc}'
+            finally:
+                close_old_connections()
+
+        failures = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for error in pool.map(run, jobs):
+                if error:
+                    failures += 1
+                    self.stderr.write(error)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(jobs) - failures} images ({failures} failed).'
+        ))
@@ -0,0 +1,142 @@
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from BlogApp import archives, feed, images, media, search, stats
+from BlogApp.models import ImportCheckpoint, Post
+
+from .seed_blog import explicit_created_at
+
+
+class Command(BaseCommand):
+    help = (
+        'Import posts from a JSONL file (or - for stdin) or a directory of Markdown '
+        'files written by export_posts. Posts are created in batches, one '
+        'transaction each, and the position reached in the archive is saved with '
+        'each batch. An interrupted import is resumed by running it again on the '
+        'same path (not possible for stdin).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='A .jsonl file, - for stdin, or a directory of .md files.')
+        parser.add_argument('--format', choices=('jsonl', 'markdown'),
+                            help='Default: jsonl for .jsonl/.json paths and -, otherwise markdown.')
+        parser.add_argument('--media-dir',
+                            help='Where cover images are read from (default: media/ beside the archive).')
+        parser.add_argument('--workers', type=int, default=settings.BLOG_IMAGE_WORKERS,
+                            help='Cover images stored in parallel.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore the position saved by an interrupted import and start over.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or archives.guess_format(path)
+        if format == 'markdown' and not os.path.isdir(path):
+            raise CommandError(f'{path} is not a directory of Markdown files.')
+        self.media_dir = options['media_dir'] or archives.media_dir(path)
+        self.author_ids = {}
+        self.totals = Counter()
+
+        self.checkpoint = None
+        if path != '-':
+            source = os.path.abspath(path)
+            if options['restart']:
+                ImportCheckpoint.objects.filter(source=source).delete()
+            self.checkpoint, _ = ImportCheckpoint.objects.get_or_create(source=source)
+        resume_at = self.checkpoint.position if self.checkpoint else 0
+        if resume_at:
+            self.stdout.write(f'Resuming after record {resume_at} (--restart starts over).')
+
+        records = islice(archives.read_archive(path, format), resume_at, None)
+        with ThreadPoolExecutor(max_workers=options['workers']) as self.pool:
+            try:
+                while batch := list(islice(records, options['batch_size'])):
+                    self.import_batch(batch)
+                    self.stdout.write(f"{self.totals['imported']} imported...")
+            except archives.ArchiveError as exc:
+                raise CommandError(f'{exc} (everything before it was imported)') from exc
+        if self.checkpoint:
+            self.checkpoint.delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.totals['imported']} posts; skipped {self.totals['unknown_author']} "
+            f"by unknown authors."
+        ))
+
+    def resolve_authors(self, batch):
+        """Map usernames to ids, querying only names not seen in earlier batches."""
+        new = {record['author'] for record in batch} - self.author_ids.keys()
+        if new:
+            found = dict(User.objects.filter(username__in=new).values_list('username', 'pk'))
+            for username in sorted(new - found.keys()):
+                self.stderr.write(f'Unknown author {username!r}; their posts are skipped.')
+            self.author_ids.update({username: found.get(username) for username in new})
+
+    def import_batch(self, batch):
+        self.resolve_authors(batch)
+        records = []
+        for record in batch:
+            record['author_id'] = self.author_ids[record['author']]
+            if record['author_id'] is None:
+                self.totals['unknown_author'] += 1
+            else:
+                records.append(record)
+
+        # Files are stored before the transaction so it holds no locks during I/O.
+        covers = list(self.pool.map(self.store_cover, [record.get('cover_image') for record in records]))
+
+        title_length = Post._meta.get_field('title').max_length
+        now = timezone.now()
+        posts = []
+        for record, cover in zip(records, covers):
+            created_at = record.get('created_at') or now
+            post = Post(
+                author_id=record['author_id'],
+                title=record['title'][:title_length],
+                content=record['content'],
+                created_at=created_at,
+                edited_at=created_at,
+                cover_image=cover,
+            )
+            post.render_content()  # bulk_create doesn't call save()
+            posts.append(post)
+
+        # What the post_save signals do for single posts, once per batch.
+        with transaction.atomic(), explicit_created_at(Post):
+            Post.objects.bulk_create(posts)
+            search.index_posts(posts)
+            for author_id, count in Counter(post.author_id for post in posts).items():
+                stats.adjust(stats.for_user(author_id), post_count=count)
+            feed.fan_out_posts(posts)
+            media.adjust_refs(Counter(post.cover_image.name for post in posts if post.cover_image))
+            for post in posts:
+                if post.cover_image:
+                    images.schedule_variants(post, 'cover_image')
+            if self.checkpoint:
+                self.checkpoint.position += len(batch)
+                self.checkpoint.save(update_fields=['position', 'updated_at'])
+        self.totals['imported'] += len(posts)
+
+    def store_cover(self, name):
+        """Copy a cover image into media storage; returns its stored name (or None)."""
+        if not name:
+            return None
+        field = Post._meta.get_field('cover_image')
+        source = os.path.join(self.media_dir, name) if self.media_dir else None
+        if source and os.path.isfile(source):
+            with open(source, 'rb') as f:
+                return field.storage.save(field.generate_filename(None, os.path.basename(name)), File(f))
+        if field.storage.exists(name):
+            # Exported from this site's own storage; the file is already there.
+            return name
+        self.stderr.write(f'Cover image {name!r} not found; imported without it.')
+        return None
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from BlogApp import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for every post.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of posts written to the index per batch.')
+
+    def handle(self, *args, **options):
+        total = search.rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} posts.'))
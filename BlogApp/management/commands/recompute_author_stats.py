@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from BlogApp import stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute every AuthorStats row, and the vote and comment counts of every '
+        'post, from the source tables and fix any drift.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of users (or posts) reconciled per batch.')
+
+    def handle(self, *args, **options):
+        fixed = stats.recompute(batch_size=options['batch_size'])
+        fixed_posts = stats.recompute_post_counters(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Corrected {fixed} author stats rows and the counters of {fixed_posts} posts.'
+        ))
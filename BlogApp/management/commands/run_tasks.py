@@ -0,0 +1,69 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from BlogApp import tasks
+
+
+def run_threads(threads, poll_interval, once):
+    """Run ``threads`` worker loops in this process until stopped."""
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop_event.set())
+    workers = [
+        threading.Thread(target=tasks.work, args=(stop_event, poll_interval, once), daemon=True)
+        for _ in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        while any(worker.is_alive() for worker in workers):
+            for worker in workers:
+                worker.join(timeout=0.5)
+    except KeyboardInterrupt:
+        stop_event.set()
+        for worker in workers:
+            worker.join()
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks from the Task table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Number of worker processes.')
+        parser.add_argument('--threads', type=int, default=2,
+                            help='Number of worker threads per process.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit when the queue is empty instead of polling.')
+
+    def handle(self, *args, **options):
+        requeued = tasks.requeue_stale()
+        purged = tasks.purge_finished()
+        self.stdout.write(f'Requeued {requeued} stale tasks, purged {purged} finished tasks.')
+
+        processes, threads = options['processes'], options['threads']
+        worker_args = (threads, options['poll_interval'], options['once'])
+        self.stdout.write(f'Starting {processes} process(es) x {threads} thread(s).')
+
+        if processes == 1:
+            run_threads(*worker_args)
+            return
+
+        # Children must not share the parent's database connections.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        children = [context.Process(target=run_threads, args=worker_args) for _ in range(processes)]
+        for child in children:
+            child.start()
+        try:
+            for child in children:
+                child.join()
+        except KeyboardInterrupt:
+            for child in children:
+                child.terminate()
+                child.join()
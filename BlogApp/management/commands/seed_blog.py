@@ -0,0 +1,267 @@
+import random
+import re
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Substr
+from django.utils import timezone
+
+from BlogApp import search, stats, trending
+from BlogApp.models import Comment, FeedEntry, Post, Profile
+
+WORDS = (
+    'the of and to in is was for on that with as by at from this it be are '
+    'django python web server cache query index page post blog comment reader '
+    'writer story travel food music code design data system network '
+    'light night city river mountain coffee morning weekend project garden '
+    'fast slow simple better small large early late first last new old good '
+    'build ship test measure profile tune learn share write read think plan'
+).split()
+
+
+def zipf_cum_weights(n, exponent):
+    """Cumulative weights where rank r gets 1 / r**exponent (a power law)."""
+    return list(accumulate(1 / rank ** exponent for rank in range(1, n + 1)))
+
+
+def skewed_sample(rng, population, cum_weights, k):
+    total = cum_weights[-1]
+    return [population[bisect_left(cum_weights, rng.random() * total)] for _ in range(k)]
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+@contextmanager
+def explicit_created_at(*models):
+    """Let bulk_create keep the generated created_at instead of auto_now_add's now()."""
+    fields = [model._meta.get_field('created_at') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def seeded_users(prefix):
+    """Users this command generated with ``prefix``: the prefix and a number, nothing else."""
+    return User.objects.filter(username__regex=rf'^{re.escape(prefix)}[0-9]+$')
+
+
+def next_seed_number(prefix):
+    """One past the largest number used after ``prefix``, so gaps left by deletes are never reused."""
+    largest = seeded_users(prefix).aggregate(
+        n=Max(Cast(Substr('username', len(prefix) + 1), IntegerField()))
+    )['n']
+    return 0 if largest is None else largest + 1
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate synthetic users, follows, posts, comments and votes with '
+        'power-law skew (a few very popular authors and viral posts).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--writers', type=float, default=0.1,
+                            help='Fraction of users in the Writers group.')
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--votes', type=int, default=50000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Average number of authors each user follows.')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Power-law exponent for author and post popularity.')
+        parser.add_argument('--days', type=int, default=365,
+                            help='Spread post dates over this many days.')
+        parser.add_argument('--prefix', default='seed',
+                            help='Username prefix of generated users.')
+        parser.add_argument('--password', default='password')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete users with the prefix (and their content) first.')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+
+        if options['clear']:
+            deleted, _ = seeded_users(prefix).delete()
+            self.stdout.write(f'Deleted {deleted} existing rows.')
+
+        with transaction.atomic(), explicit_created_at(Post, Comment):
+            users, writers = self.create_users(options)
+            follows = self.create_follows(users, writers, options)
+            posts = self.create_posts(writers, options)
+            comments = self.create_comments(users, posts, options)
+            votes = self.create_votes(users, posts, options)
+            feed_entries = self.create_feed_entries(follows, posts)
+            self.update_counters([post.pk for post in posts])
+
+        self.stdout.write('Rebuilding search index, author stats and trending scores...')
+        search.rebuild_index(batch_size=self.batch_size)
+        stats.recompute(batch_size=self.batch_size)
+        trending.decay(batch_size=self.batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(users)} users ({len(writers)} writers), {sum(map(len, follows.values()))} follows, '
+            f'{len(posts)} posts, {comments} comments, {votes} votes, {feed_entries} feed entries.'
+        ))
+
+    def create_users(self, options):
+        password = make_password(options['password'])
+        start = next_seed_number(options['prefix'])
+        users = User.objects.bulk_create(
+            [User(username=f"{options['prefix']}{start + i}", password=password,
+                  email=f"{options['prefix']}{start + i}@example.com")
+             for i in range(options['users'])],
+            batch_size=self.batch_size,
+        )
+        # bulk_create skips the post_save signals, so provision profiles here.
+        Profile.objects.bulk_create([Profile(user=user) for user in users], batch_size=self.batch_size)
+        self.profile_ids = dict(Profile.objects.filter(user__in=users).values_list('user_id', 'pk'))
+
+        writers = self.rng.sample(users, max(1, int(len(users) * options['writers'])))
+        group, _ = Group.objects.get_or_create(name='Writers')
+        User.groups.through.objects.bulk_create(
+            [User.groups.through(user_id=user.pk, group_id=group.pk) for user in writers],
+            batch_size=self.batch_size,
+        )
+        return users, writers
+
+    def create_follows(self, users, writers, options):
+        """
+        Follow counts per user are Pareto distributed and targets are drawn
+        by a power law over popularity, with writers ranked above readers.
+        Returns {follower: set of followed users}.
+        """
+        writer_ids = {user.pk for user in writers}
+        ranked = writers + [user for user in users if user.pk not in writer_ids]
+        cum_weights = zipf_cum_weights(len(ranked), options['skew'])
+        follows = {}
+        Follow = Profile.following.through
+        rows = []
+        for user in users:
+            k = min(len(users) - 1, int(options['follows'] / 2 * self.rng.paretovariate(2)))
+            targets = set(skewed_sample(self.rng, ranked, cum_weights, k))
+            targets.discard(user)
+            follows[user] = targets
+            rows.extend(Follow(from_profile_id=self.profile_ids[user.pk],
+                               to_profile_id=self.profile_ids[target.pk])
+                        for target in targets)
+        Follow.objects.bulk_create(rows, batch_size=self.batch_size)
+        return follows
+
+    def create_posts(self, writers, options):
+        cum_weights = zipf_cum_weights(len(writers), options['skew'])
+        now = timezone.now()
+        posts = []
+        for author in skewed_sample(self.rng, writers, cum_weights, options['posts']):
+            paragraphs = [
+                ' '.join(sentence(self.rng, self.rng.randint(6, 20)) for _ in range(self.rng.randint(2, 6)))
+                for _ in range(max(1, int(self.rng.lognormvariate(1, 0.6))))
+            ]
+            post = Post(
+                author=author,
+                title=sentence(self.rng, self.rng.randint(3, 8))[:-1],
+                content='\n\n'.join(paragraphs),
+                created_at=now - timedelta(seconds=self.rng.randint(0, options['days'] * 86400)),
+            )
+            post.render_content()  # bulk_create doesn't call save()
+            posts.append(post)
+        return Post.objects.bulk_create(posts, batch_size=self.batch_size)
+
+    def viral_order(self, posts, options):
+        """Posts shuffled into a popularity ranking plus power-law weights for it."""
+        ranked = list(posts)
+        self.rng.shuffle(ranked)
+        return ranked, zipf_cum_weights(len(ranked), options['skew'])
+
+    def create_comments(self, users, posts, options):
+        ranked, cum_weights = self.viral_order(posts, options)
+        now = timezone.now()
+        comments = []
+        for post in skewed_sample(self.rng, ranked, cum_weights, options['comments']):
+            delay = timedelta(seconds=int(self.rng.expovariate(1 / 86400)))
+            comments.append(Comment(
+                post=post,
+                author=self.rng.choice(users),
+                body=sentence(self.rng, self.rng.randint(4, 30)),
+                created_at=min(now, post.created_at + delay),
+            ))
+        Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+        return len(comments)
+
+    def create_votes(self, users, posts, options):
+        ranked, cum_weights = self.viral_order(posts, options)
+        pairs = set()
+        for post in skewed_sample(self.rng, ranked, cum_weights, options['votes']):
+            pairs.add((post.pk, self.rng.choice(users).pk))
+        likes, dislikes = [], []
+        for post_id, user_id in pairs:
+            if self.rng.random() < 0.85:
+                likes.append(Post.likes.through(post_id=post_id, user_id=user_id))
+            else:
+                dislikes.append(Post.dislikes.through(post_id=post_id, user_id=user_id))
+        Post.likes.through.objects.bulk_create(likes, batch_size=self.batch_size)
+        Post.dislikes.through.objects.bulk_create(dislikes, batch_size=self.batch_size)
+        return len(pairs)
+
+    def create_feed_entries(self, follows, posts):
+        """Materialize timelines the way feed.backfill() would for each follow."""
+        recent = {}
+        for post in sorted(posts, key=lambda post: (post.created_at, post.pk), reverse=True):
+            by_author = recent.setdefault(post.author_id, [])
+            if len(by_author) < settings.BLOG_FEED_BACKFILL:
+                by_author.append(post)
+
+        follower_counts = {}
+        for targets in follows.values():
+            for target in targets:
+                follower_counts[target.pk] = follower_counts.get(target.pk, 0) + 1
+
+        total = 0
+        batch = []
+        for owner, targets in follows.items():
+            for author in targets:
+                if follower_counts[author.pk] > settings.BLOG_FEED_FANOUT_LIMIT:
+                    continue  # Popular authors are merged in at read time
+                for post in recent.get(author.pk, ()):
+                    batch.append(FeedEntry(owner_id=owner.pk, post_id=post.pk,
+                                           author_id=author.pk, created_at=post.created_at))
+                if len(batch) >= self.batch_size:
+                    FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+                    total += len(batch)
+                    batch = []
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        return total + len(batch)
+
+    def update_counters(self, post_ids):
+        """Fill the denormalized counters that signals would normally maintain."""
+        for field, queryset, key in (
+            ('like_count', Post.likes.through.objects, 'post_id'),
+            ('dislike_count', Post.dislikes.through.objects, 'post_id'),
+            ('comment_count', Comment.objects, 'post_id'),
+        ):
+            counts = (
+                queryset.filter(**{key: OuterRef('pk')})
+                .values(key).annotate(n=Count('pk')).values('n')
+            )
+            for start in range(0, len(post_ids), self.batch_size):
+                Post.objects.filter(pk__in=post_ids[start:start + self.batch_size]).update(
+                    **{field: Coalesce(Subquery(counts), Value(0))}
+                )
@@ -0,0 +1,212 @@
+"""
+Content-addressed media: reference counting and garbage collection.
+
+Cover images and profile pictures are stored under the SHA-256 of their
+bytes by ContentAddressedStorage (storage.py), whatever the uploaded file
+was called::
+
+    blobs/3f/3fa94c...e1.jpg
+
+Every post that uses the same picture therefore shares one file, and so do
+its resized variants (images.py names them after the source).
+
+Each stored file has a MediaBlob row counting the image fields that refer
+to it, kept by the signal handlers in signals.py. Files nobody refers to
+any more are deleted by `manage.py gc_media`, which can also recount the
+references from the tables. Because a name is never reused for other
+content, blobs can be served with immutable cache headers.
+"""
+import os
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import MediaBlob, Post, Profile
+from .storage import BLOB_DIR, TMP_DIR, TRASH_SUFFIX, is_blob
+
+# The image fields whose files are reference counted.
+MEDIA_FIELDS = {
+    Post: ('cover_image',),
+    Profile: ('profile_pic',),
+}
+
+# Precompressed copies written beside a file by `manage.py compress_media`.
+COMPRESSED_SUFFIXES = ('.br', '.gz')
+
+
+# --- Reference counting ---
+
+def _name(value):
+    name = getattr(value, 'name', value)
+    return name or None
+
+
+def remember_names(instance):
+    """Note the file names ``instance`` was loaded with (post_init)."""
+    instance._media_names = {
+        field: _name(instance.__dict__[field])
+        for field in MEDIA_FIELDS[type(instance)] if field in instance.__dict__
+    }
+
+
+def load_missing_names(instance):
+    """
+    Before saving, read the stored names of image fields that were deferred
+    when ``instance`` was loaded but have been assigned since (pre_save).
+    """
+    if instance._state.adding:
+        return
+    missing = [
+        field for field in MEDIA_FIELDS[type(instance)]
+        if field in instance.__dict__ and field not in instance._media_names
+    ]
+    if missing:
+        stored = type(instance)._base_manager.filter(pk=instance.pk).values(*missing).first() or {}
+        instance._media_names.update({field: _name(stored.get(field)) for field in missing})
+
+
+def count_saved_names(instance, created, update_fields=None):
+    """Move references from the old file names of ``instance`` to the new ones (post_save)."""
+    old = {} if created else instance._media_names
+    changes = Counter()
+    for field in MEDIA_FIELDS[type(instance)]:
+        if field not in instance.__dict__:
+            continue
+        if update_fields is not None and field not in update_fields:
+            continue
+        new = _name(instance.__dict__[field])
+        if created or field in old:
+            before = old.get(field)
+            if before != new:
+                changes[new] += 1
+                changes[before] -= 1
+        instance._media_names[field] = new
+    adjust_refs(changes)
+
+
+def count_deleted_names(instance):
+    adjust_refs(Counter({
+        _name(instance.__dict__[field]): -1
+        for field in MEDIA_FIELDS[type(instance)] if field in instance.__dict__
+    }))
+
+
+def adjust_refs(changes):
+    """Apply ``{name: delta}`` to the blobs' reference counts; other names are ignored."""
+    by_delta = defaultdict(list)
+    for name, delta in changes.items():
+        if delta and is_blob(name):
+            by_delta[delta].append(name)
+    for delta, names in by_delta.items():
+        MediaBlob.objects.filter(name__in=names).update(ref_count=F('ref_count') + delta)
+
+
+def recount_refs():
+    """Set every blob's reference count from the image fields. Returns the number corrected."""
+    counts = Counter()
+    for model, fields in MEDIA_FIELDS.items():
+        for field in fields:
+            rows = (
+                model.objects.filter(**{f'{field}__startswith': f'{BLOB_DIR}/'})
+                .values_list(field).annotate(n=Count('pk')).order_by()
+            )
+            counts.update(dict(rows))
+
+    with transaction.atomic():
+        wrong = [
+            MediaBlob(pk=pk, ref_count=counts.get(name, 0))
+            for pk, name, ref_count in MediaBlob.objects.select_for_update().values_list('pk', 'name', 'ref_count')
+            if ref_count != counts.get(name, 0)
+        ]
+        MediaBlob.objects.bulk_update(wrong, ['ref_count'], batch_size=1000)
+    return len(wrong)
+
+
+# --- Garbage collection ---
+
+def collect_garbage(storage, grace, dry_run=False):
+    """
+    Delete blobs (and their variants) that nothing refers to and that
+    weren't uploaded within ``grace`` (a timedelta), then stray files in the
+    blob and temporary directories older than that. Returns
+    ``(files deleted, bytes freed)``.
+    """
+    cutoff = timezone.now() - grace
+    deleted = freed = 0
+    orphans = MediaBlob.objects.filter(ref_count__lte=0, saved_at__lt=cutoff).values_list('pk', 'name', 'size')
+    for pk, name, size in orphans.iterator():
+        if dry_run:
+            deleted, freed = deleted + 1, freed + size
+            continue
+        path = storage.path(name)
+        trash = path + TRASH_SUFFIX
+        # Move the file aside before deleting the row: an upload of the same
+        # content in between touches saved_at, the delete below then matches
+        # nothing and the file is put back.
+        moved = _rename(path, trash)
+        if MediaBlob.objects.filter(pk=pk, ref_count__lte=0, saved_at__lt=cutoff).delete()[0]:
+            # Only the moved copy is certainly garbage: once the row is gone,
+            # the same content may be uploaded to ``path`` again.
+            if moved:
+                os.remove(trash)
+            if not MediaBlob.objects.filter(name=name).exists():
+                for suffix in COMPRESSED_SUFFIXES:
+                    storage.delete(name + suffix)
+                delete_variants(storage, name)
+            deleted, freed = deleted + 1, freed + size
+        elif moved:
+            os.replace(trash, path)
+
+    # Files whose row was never written (a crash between the two) and
+    # temporary files of interrupted uploads.
+    known = None
+    for directory in (BLOB_DIR, TMP_DIR):
+        for path in _files_older_than(storage.path(directory), cutoff):
+            name = os.path.relpath(path, storage.location).replace(os.sep, '/')
+            if directory == BLOB_DIR:
+                if known is None:
+                    known = set(MediaBlob.objects.values_list('name', flat=True))
+                if name in known or name.endswith(COMPRESSED_SUFFIXES) and name[:-3] in known:
+                    continue
+            size = os.path.getsize(path)
+            if not dry_run:
+                os.remove(path)
+            deleted, freed = deleted + 1, freed + size
+    return deleted, freed
+
+
+def _rename(source, target):
+    try:
+        os.replace(source, target)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def delete_file(storage, name):
+    """Delete a stored file and its precompressed copies."""
+    for suffix in ('', *COMPRESSED_SUFFIXES):
+        storage.delete(name + suffix)
+
+
+def delete_variants(storage, name):
+    stem = os.path.splitext(name)[0]
+    directory, prefix = os.path.split(f'variants/{stem}-')
+    try:
+        files = storage.listdir(directory)[1]
+    except FileNotFoundError:
+        return
+    for file in files:
+        if file.startswith(prefix):
+            storage.delete(f'{directory}/{file}')
+
+
+def _files_older_than(root, cutoff):
+    timestamp = cutoff.timestamp()
+    for directory, _, files in os.walk(root):
+        for file in files:
+            path = os.path.join(directory, file)
+            if os.path.getmtime(path) < timestamp:
+                yield path
@@ -0,0 +1,242 @@
+import os
+import time
+from urllib.parse import quote, urlparse
+from wsgiref.headers import Headers
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from whitenoise.base import WhiteNoise
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.string_utils import ensure_leading_trailing_slash
+
+from . import identity, routers, storage
+
+
+async def _read_chunks(file, chunk_size=FileResponse.block_size):
+    try:
+        while chunk := await sync_to_async(file.read, thread_sensitive=False)(chunk_size):
+            yield chunk
+    finally:
+        await sync_to_async(file.close, thread_sensitive=False)()
+
+
+async def aserve(static_file, request):
+    """
+    WhiteNoiseMiddleware.serve() for async requests. Under ASGI, Django
+    reads a sync FileResponse whole into memory before sending it; this
+    streams the file instead, reading each chunk in a pool thread.
+    """
+    response = await sync_to_async(static_file.get_response, thread_sensitive=False)(
+        request.method, request.META
+    )
+    if response.file is None:  # HEAD, 304, 405, 416
+        http_response = HttpResponse(status=int(response.status))
+    else:
+        http_response = StreamingHttpResponse(_read_chunks(response.file), status=int(response.status))
+    del http_response['Content-Type']
+    for key, value in response.headers:
+        http_response[key] = value
+    return http_response
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that can also run in an async middleware chain.
+
+    WhiteNoise's own middleware is sync-only. Under ASGI, Django would then
+    run every request through it in the single thread used for sync code,
+    so requests would queue behind each other. This version awaits the rest
+    of the stack directly and only uses a thread to serve static files.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await aserve(static_file, request)
+        return await self.get_response(request)
+
+
+class MediaMiddleware(WhiteNoise):
+    """
+    Serve uploads (MEDIA_URL) in every environment, the way WhiteNoise
+    serves static files: ETag and Last-Modified with 304s, Range requests,
+    and precompressed .br/.gz copies where `manage.py compress_media` made
+    them. Content-addressed blobs (see media.py) are cached forever, with
+    their hash as ETag; other files for BLOG_MEDIA_MAX_AGE.
+
+    Files are looked up on every request (uploads appear at any time), but
+    only for URLs under MEDIA_URL. The bytes are sent with sendfile() by
+    WSGI servers that support it, and streamed from a pool thread under
+    ASGI. Behind nginx or Apache, BLOG_MEDIA_ACCEL_REDIRECT or
+    BLOG_MEDIA_X_SENDFILE hand the file to the web server instead, and no
+    Python code touches the bytes.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.prefix = ensure_leading_trailing_slash(urlparse(settings.MEDIA_URL).path)
+        super().__init__(
+            None, autorefresh=True, max_age=settings.BLOG_MEDIA_MAX_AGE, allow_all_origins=False,
+            add_headers_function=self.add_blob_etag,
+        )
+        self.add_files(settings.MEDIA_ROOT, prefix=self.prefix)
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def name_for(self, url):
+        return url[len(self.prefix):]
+
+    def immutable_file_test(self, path, url):
+        return storage.is_blob(self.name_for(url))
+
+    def add_blob_etag(self, headers, path, url):
+        name = self.name_for(url)
+        if storage.is_blob(name):
+            headers['ETag'] = f'"{os.path.splitext(os.path.basename(name))[0]}"'
+
+    def find_media(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path_info.startswith(self.prefix):
+            return None
+        if storage.is_internal(self.name_for(request.path_info)):
+            return None
+        return self.find_file(request.path_info)
+
+    def offload(self, request):
+        """A response telling the web server to send the file itself, or None."""
+        url = request.path_info
+        path = next(self.candidate_paths_for_url(url))
+        if settings.BLOG_MEDIA_ACCEL_REDIRECT:
+            header, value = 'X-Accel-Redirect', quote(settings.BLOG_MEDIA_ACCEL_REDIRECT + self.name_for(url))
+        elif settings.BLOG_MEDIA_X_SENDFILE:
+            header, value = 'X-Sendfile', path
+        else:
+            return None
+        # The server adds Content-Length, ETag and Last-Modified, and answers
+        # conditional and Range requests.
+        headers = Headers([])
+        self.add_mime_headers(headers, path, url)
+        self.add_cache_headers(headers, path, url)
+        response = HttpResponse()
+        del response['Content-Type']
+        for key, value_ in headers.items():
+            response[key] = value_
+        response[header] = value
+        return response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        static_file = self.find_media(request)
+        if static_file is None:
+            return self.get_response(request)
+        return self.offload(request) or WhiteNoiseMiddleware.serve(static_file, request)
+
+    async def __acall__(self, request):
+        if not request.path_info.startswith(self.prefix):
+            return await self.get_response(request)
+        static_file = await sync_to_async(self.find_media, thread_sensitive=False)(request)
+        if static_file is None:
+            return await self.get_response(request)
+        return self.offload(request) or await aserve(static_file, request)
+
+
+class IdentityMiddleware:
+    """
+    Set request.profile to the user's Profile, loaded on first use (and then
+    usually from ProfileBackend's join, see identity.py). None for anonymous
+    users.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        request.profile = identity.lazy_profile(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.profile = identity.lazy_profile(request)
+        return await self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let reads in safe (GET/HEAD/OPTIONS) requests go to the read replica,
+    unless this client wrote something in the last
+    BLOG_READ_YOUR_WRITES_SECONDS (see routers.py). Not used without a replica.
+    """
+    sync_capable = True
+    async_capable = True
+
+    cookie_name = 'blog_primary_until'
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        if not routers.replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def reads_from_replica(self, request):
+        if request.method not in self.safe_methods:
+            return False
+        try:
+            pinned_until = float(request.COOKIES.get(self.cookie_name, 0))
+        except ValueError:
+            pinned_until = 0
+        return pinned_until < time.time()
+
+    def pin_to_primary(self, request, response):
+        if request.method not in self.safe_methods:
+            window = settings.BLOG_READ_YOUR_WRITES_SECONDS
+            response.set_cookie(self.cookie_name, str(time.time() + window),
+                                max_age=window, httponly=True, samesite='Lax')
+        return response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = routers.set_replica_reads(self.reads_from_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.reset_replica_reads(token)
+        return self.pin_to_primary(request, response)
+
+    async def __acall__(self, request):
+        token = routers.set_replica_reads(self.reads_from_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.reset_replica_reads(token)
+        return self.pin_to_primary(request, response)
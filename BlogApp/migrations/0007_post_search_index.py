@@ -0,0 +1,56 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Build the full-text side table for the current database and fill it
+    from the existing posts.
+    """
+    Post = apps.get_model('BlogApp', 'Post')
+    post_table = schema_editor.quote_name(Post._meta.db_table)
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS blogapp_post_fts "
+            "USING fts5(title, content, tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO blogapp_post_fts (rowid, title, content) "
+            f"SELECT id, title, content FROM {post_table}"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS blogapp_post_search ("
+            f"post_id bigint PRIMARY KEY REFERENCES {post_table} (id) "
+            f"ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            f"document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS blogapp_post_search_document_gin "
+            "ON blogapp_post_search USING GIN (document)"
+        )
+        schema_editor.execute(
+            f"INSERT INTO blogapp_post_search (post_id, document) "
+            f"SELECT id, setweight(to_tsvector('english', title), 'A') || "
+            f"setweight(to_tsvector('english', content), 'B') FROM {post_table}"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS blogapp_post_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP TABLE IF EXISTS blogapp_post_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BlogApp', '0006_post_keyset_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
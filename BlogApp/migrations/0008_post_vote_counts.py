@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:58
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_vote_counts(apps, schema_editor):
+    Post = apps.get_model('BlogApp', 'Post')
+    for field, through in (('like_count', Post.likes.through),
+                           ('dislike_count', Post.dislikes.through)):
+        votes = (
+            through.objects.filter(post_id=OuterRef('pk'))
+            .values('post_id').annotate(n=Count('id')).values('n')
+        )
+        Post.objects.update(**{field: Coalesce(Subquery(votes), Value(0))})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BlogApp', '0007_post_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='dislike_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_vote_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Matches BLOG_FEED_BACKFILL at the time of writing.
+BACKFILL_POSTS = 100
+
+
+def backfill_feeds(apps, schema_editor):
+    """
+    Seed timelines from the follow relationships that already exist.
+    """
+    Post = apps.get_model('BlogApp', 'Post')
+    Profile = apps.get_model('BlogApp', 'Profile')
+    FeedEntry = apps.get_model('BlogApp', 'FeedEntry')
+    follows = Profile.following.through.objects.values_list(
+        'from_profile__user_id', 'to_profile__user_id'
+    )
+    for owner_id, author_id in follows.iterator():
+        recent = Post.objects.filter(author_id=author_id).order_by('-created_at', '-id')
+        FeedEntry.objects.bulk_create([
+            FeedEntry(owner_id=owner_id, post_id=pk, author_id=author_id, created_at=created_at)
+            for pk, created_at in recent.values_list('pk', 'created_at')[:BACKFILL_POSTS]
+        ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BlogApp', '0009_post_revision'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='BlogApp.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', '-created_at', '-post'], name='feed_owner_created_idx'), models.Index(fields=['owner', 'author'], name='feed_owner_author_idx')],
+                'constraints': [models.UniqueConstraint(fields=('owner', 'post'), name='feed_entry_owner_post_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_feeds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_author_stats(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    Post = apps.get_model('BlogApp', 'Post')
+    Comment = apps.get_model('BlogApp', 'Comment')
+    Profile = apps.get_model('BlogApp', 'Profile')
+    AuthorStats = apps.get_model('BlogApp', 'AuthorStats')
+    Follow = Profile.following.through
+
+    def grouped(queryset, field):
+        return dict(queryset.values(field).annotate(n=Count('pk')).values_list(field, 'n').order_by())
+
+    counts = {
+        'post_count': grouped(Post.objects, 'author_id'),
+        'total_likes': grouped(Post.likes.through.objects, 'post__author_id'),
+        'total_comments': grouped(Comment.objects, 'post__author_id'),
+        'follower_count': grouped(Follow.objects, 'to_profile__user_id'),
+        'following_count': grouped(Follow.objects, 'from_profile__user_id'),
+    }
+    AuthorStats.objects.bulk_create([
+        AuthorStats(user_id=user_id, **{field: values.get(user_id, 0) for field, values in counts.items()})
+        for user_id in User.objects.values_list('pk', flat=True)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BlogApp', '0010_feedentry'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='author_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('post_count', models.IntegerField(default=0)),
+                ('total_likes', models.IntegerField(default=0)),
+                ('total_comments', models.IntegerField(default=0)),
+                ('follower_count', models.IntegerField(default=0)),
+                ('following_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_author_stats, migrations.RunPython.noop),
+    ]
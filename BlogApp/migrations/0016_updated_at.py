@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:19
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def posts_updated_when_created(apps, schema_editor):
+    # Existing rows got the migration time; a post's creation is a better guess.
+    Post = apps.get_model('BlogApp', 'Post')
+    Post.objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BlogApp', '0015_comment_pagination'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(posts_updated_when_created, migrations.RunPython.noop),
+    ]
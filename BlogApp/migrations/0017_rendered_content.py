@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:21
+
+from django.db import migrations, models
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+
+def render_existing_posts(apps, schema_editor):
+    # Same as Post.render_content(), which historical models don't have.
+    Post = apps.get_model('BlogApp', 'Post')
+    batch = []
+    for post in Post.objects.only('content').iterator(chunk_size=500):
+        post.content_html = linebreaks(post.content, autoescape=True)
+        post.excerpt = Truncator(post.content).words(40, truncate=' …')
+        batch.append(post)
+        if len(batch) == 500:
+            Post.objects.bulk_update(batch, ['content_html', 'excerpt'])
+            batch = []
+    if batch:
+        Post.objects.bulk_update(batch, ['content_html', 'excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BlogApp', '0016_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(render_existing_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BlogApp', '0017_rendered_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='groups_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:37
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def score_recent_posts(apps, schema_editor):
+    # Same as trending.decay(), which uses the current model.
+    Post = apps.get_model('BlogApp', 'Post')
+    now = timezone.now()
+    recent = Post.objects.filter(created_at__gte=now - timedelta(days=settings.BLOG_TRENDING_MAX_AGE_DAYS))
+    batch = []
+    for post in recent.only('like_count', 'dislike_count', 'comment_count', 'created_at').iterator(chunk_size=1000):
+        points = post.like_count - post.dislike_count + settings.BLOG_TRENDING_COMMENT_WEIGHT * post.comment_count
+        age_hours = max(0.0, (now - post.created_at).total_seconds() / 3600)
+        post.trending_score = points / (age_hours + 2) ** settings.BLOG_TRENDING_GRAVITY
+        batch.append(post)
+        if len(batch) == 1000:
+            Post.objects.bulk_update(batch, ['trending_score'])
+            batch = []
+    if batch:
+        Post.objects.bulk_update(batch, ['trending_score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BlogApp', '0019_follow_suggestions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-trending_score', '-id'], name='post_trending_id_idx'),
+        ),
+        migrations.RunPython(score_recent_posts, migrations.RunPython.noop),
+    ]
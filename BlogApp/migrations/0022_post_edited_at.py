@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:12
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def posts_edited_when_updated(apps, schema_editor):
+    # Votes and comments also moved updated_at, but it is never earlier than the last edit.
+    Post = apps.get_model('BlogApp', 'Post')
+    Post.objects.update(edited_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BlogApp', '0021_media_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='edited_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.RunPython(posts_edited_when_updated, migrations.RunPython.noop),
+    ]
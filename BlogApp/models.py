@@ -1,21 +1,92 @@
+from django.core.files.storage import storages
 from django.db import models
+from django.utils import timezone
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
 from django.contrib.auth.models import User
 
+# Length of the excerpt shown in post lists.
+EXCERPT_WORDS = 40
+
+
+def media_storage():
+    """Storage of uploaded images: STORAGES['media'], content-addressed (see media.py)."""
+    return storages['media']
+
+
+class PostQuerySet(models.QuerySet):
+    def for_listing(self):
+        """
+        Posts as shown in list pages: author joined in, the stored excerpt
+        instead of the body.
+        """
+        return (
+            self.select_related('author')
+            .only('title', 'excerpt', 'cover_image', 'cover_variants', 'created_at', 'updated_at',
+                  'author__username')
+        )
+
+
 class Post(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
     title = models.CharField(max_length=200)
     content = models.TextField()
-    cover_image = models.ImageField(upload_to='post_covers/', blank=True, null=True)
+    # The body as HTML and the list excerpt, rendered from content on save so
+    # pages never process the full text.
+    content_html = models.TextField(blank=True, editable=False)
+    excerpt = models.TextField(blank=True, editable=False)
+    cover_image = models.ImageField(upload_to='post_covers/', storage=media_storage, blank=True, null=True)
+    # Resized WebP/JPEG copies of cover_image (see images.py).
+    cover_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Last change to anything shown for the post: edits, votes, comments and
+    # image variants. Drives ETag/Last-Modified (see conditional.py).
+    updated_at = models.DateTimeField(auto_now=True)
+    # Last change to the title or body only, which is what feeds show
+    # (see syndication.py); votes and comments leave it alone.
+    edited_at = models.DateTimeField(default=timezone.now, editable=False)
 
     likes = models.ManyToManyField(User, related_name='blog_post_likes', blank=True)
     dislikes = models.ManyToManyField(User, related_name='blog_post_dislikes', blank=True)
+    # Denormalized vote totals, maintained by votes.toggle_vote().
+    like_count = models.PositiveIntegerField(default=0)
+    dislike_count = models.PositiveIntegerField(default=0)
+    # Denormalized number of comments, maintained by signals.py.
+    comment_count = models.PositiveIntegerField(default=0)
+    # Bumped whenever anything shown on the detail page changes (edits,
+    # comments, votes); part of the rendered-fragment cache keys.
+    revision = models.PositiveIntegerField(default=0)
+    # Votes and comments decayed by age (see trending.py).
+    trending_score = models.FloatField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
     
     def __str__(self):
         return self.title
 
+    def render_content(self):
+        """Fill content_html and excerpt from content (what |linebreaks and |truncatewords gave)."""
+        self.content_html = linebreaks(self.content, autoescape=True)
+        self.excerpt = Truncator(self.content).words(EXCERPT_WORDS, truncate=' …')
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.render_content()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'content_html', 'excerpt'}
+        if self.pk is not None and (update_fields is None or {'title', 'content'} & set(update_fields)):
+            self.edited_at = timezone.now()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'edited_at'}
+        super().save(*args, **kwargs)
+
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='post_created_id_idx'),
+            models.Index(fields=['-trending_score', '-id'], name='post_trending_id_idx'),
+        ]
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
@@ -27,23 +98,154 @@ class Comment(models.Model):
         return f'Comment by {self.author.username} on {self.post.title}'
 
     class Meta:
-        ordering = ['created_at']
+        ordering = ['created_at', 'id']
+        indexes = [
+            # Comment pages are keyset-paginated oldest first within a post.
+            models.Index(fields=['post', 'created_at', 'id'], name='comment_post_created_id_idx'),
+        ]
 
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     
-    profile_pic = models.ImageField(default='default.jpg', upload_to='profile_pics')
+    profile_pic = models.ImageField(default='default.jpg', upload_to='profile_pics', storage=media_storage)
+    # Resized WebP/JPEG copies of profile_pic (see images.py).
+    pic_variants = models.JSONField(default=dict, blank=True, editable=False)
     bio = models.TextField(blank=True, null=True, help_text="A short bio about yourself.")
 
     following = models.ManyToManyField("self", related_name="followers", symmetrical=False, blank=True)
+    # Last edit of the profile or its picture variants (for conditional GET).
+    updated_at = models.DateTimeField(auto_now=True)
+    # Bumped whenever the user's groups change; invalidates the group names
+    # cached in their sessions (see identity.py).
+    groups_version = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return f'{self.user.username} Profile'
-    
 
 
+class FeedEntry(models.Model):
+    """
+    One post in a reader's materialized "following" timeline.
+    Rows are written by feed.py when posts are published and on follow/unfollow.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feed_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    # Copy of post.created_at so the timeline is a range scan of one index.
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'post'], name='feed_entry_owner_post_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-post'], name='feed_owner_created_idx'),
+            models.Index(fields=['owner', 'author'], name='feed_owner_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} in feed of {self.owner_id}'
+
+
+class AuthorStats(models.Model):
+    """
+    Per-author totals shown on profile pages, one row per user.
+    Kept current by the signal handlers in signals.py (see stats.py) and
+    reconciled in bulk by `manage.py recompute_author_stats`.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True,
+                                related_name='author_stats')
+    post_count = models.IntegerField(default=0)
+    total_likes = models.IntegerField(default=0)
+    total_comments = models.IntegerField(default=0)
+    follower_count = models.IntegerField(default=0)
+    following_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'Stats for {self.user_id}'
 
 
+class FollowSuggestion(models.Model):
+    """
+    A user's "who to follow" picks, computed offline for the whole follower
+    graph by `manage.py compute_follow_suggestions` (see follows.py).
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True,
+                                related_name='follow_suggestions')
+    # Best first: [{'id': user id, 'username': ..., 'score': ...}, ...]
+    suggestions = models.JSONField(default=list)
+    computed_at = models.DateTimeField(auto_now=True)
 
-    
\ No newline at end of file
+    def __str__(self):
+        return f'Suggestions for {self.user_id}'
+
+
+class MediaBlob(models.Model):
+    """
+    One stored upload, named by the hash of its content, and how many image
+    fields refer to it. Unreferenced blobs are deleted by `manage.py gc_media`
+    (see media.py).
+    """
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.IntegerField(default=0)
+    # Last upload of this content; the garbage collector leaves recent blobs
+    # alone, since the row that will refer to them may not be saved yet.
+    saved_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.name
+
+
+class Task(models.Model):
+    """
+    A queued unit of background work, run by `manage.py run_tasks` (see tasks.py).
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0, help_text="Higher runs first.")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    # At most one pending task per key; cleared when the task finishes.
+    idempotency_key = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at'], name='task_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
+
+
+class ImportCheckpoint(models.Model):
+    """
+    How far an interrupted `manage.py import_posts` got through an archive,
+    so running it again resumes after the last committed record.
+    """
+    source = models.CharField(max_length=500, unique=True, help_text="Absolute path of the archive.")
+    # Records of the archive already handled (imported or skipped), in archive order.
+    position = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.source} @ {self.position}'
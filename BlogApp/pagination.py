@@ -0,0 +1,91 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are addressed by an opaque cursor that encodes the ``(created_at, id)``
+of the last row on the previous page, so fetching page N costs the same
+indexed range scan as fetching page 1 (no OFFSET).
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor string can't be decoded."""
+
+
+def encode_cursor(created_at, pk):
+    raw = f'{created_at.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+class KeysetPage:
+    """
+    One page of results plus the cursor for the next one (None on the last page).
+    """
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _keyset_queryset(queryset, cursor, per_page, descending, id_field):
+    if descending:
+        queryset = queryset.order_by('-created_at', f'-{id_field}')
+    else:
+        queryset = queryset.order_by('created_at', id_field)
+
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        op = 'lt' if descending else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'created_at__{op}': created_at})
+            | Q(**{'created_at': created_at, f'{id_field}__{op}': pk})
+        )
+    return queryset[:per_page + 1]
+
+
+def _page(items, per_page, id_field):
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, getattr(last, id_field))
+    return KeysetPage(items, next_cursor)
+
+
+def paginate_keyset(queryset, cursor=None, per_page=10, descending=True, id_field='id'):
+    """
+    Return a KeysetPage of ``queryset`` ordered by ``(created_at, <id_field>)``.
+
+    One extra row is fetched to find out whether a next page exists,
+    so no COUNT query is ever issued.
+    """
+    items = list(_keyset_queryset(queryset, cursor, per_page, descending, id_field))
+    return _page(items, per_page, id_field)
+
+
+async def apaginate_keyset(queryset, cursor=None, per_page=10, descending=True, id_field='id'):
+    """Async version of paginate_keyset(), for async views."""
+    items = [item async for item in _keyset_queryset(queryset, cursor, per_page, descending, id_field)]
+    return _page(items, per_page, id_field)
@@ -0,0 +1,151 @@
+"""
+SQL query recording, N+1 detection and per-view query budgets.
+
+QueryRecorder hooks every database connection with execute_wrapper() and
+keeps each statement plus a normalized "shape" (literals and placeholder
+lists collapsed). The same shape running BLOG_N_PLUS_ONE_THRESHOLD or more
+times in one request is reported as an N+1 pattern.
+
+BLOG_QUERY_BUDGETS maps URL names to the most queries a request may run.
+Budgets are checked by QueryInspectionMiddleware (opt-in, DEBUG only) and,
+in tests, by request_within_budget(), which fails the test instead.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+_TRANSACTION_CONTROL = re.compile(r'^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE SAVEPOINT)\b', re.IGNORECASE)
+
+
+def normalize(sql):
+    """Reduce a statement to its shape, so the same query with other values compares equal."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request ran more queries than its budget, or repeated a query shape."""
+
+
+class QueryRecorder:
+    """
+    Record every statement run on any database connection while active::
+
+        with QueryRecorder() as recorder:
+            ...
+        recorder.count, recorder.repeated_shapes()
+    """
+    def __init__(self):
+        self.queries = []
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # Transaction control isn't counted: tests wrap everything in
+        # savepoints, so it would make budgets differ from production.
+        if _TRANSACTION_CONTROL.match(sql):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'shape': normalize(sql),
+                'duration': time.perf_counter() - start,
+            })
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(query['duration'] for query in self.queries)
+
+    def shapes(self):
+        return Counter(query['shape'] for query in self.queries)
+
+    def repeated_shapes(self, threshold=None):
+        """Shapes run at least ``threshold`` times: likely N+1 patterns."""
+        threshold = threshold or settings.BLOG_N_PLUS_ONE_THRESHOLD
+        return {shape: n for shape, n in self.shapes().items() if n >= threshold}
+
+
+def budget_for(url_name):
+    return settings.BLOG_QUERY_BUDGETS.get(url_name)
+
+
+def problems(recorder, url_name, budget=None):
+    """Human-readable budget and N+1 problems for one request (empty if none)."""
+    found = []
+    budget = budget if budget is not None else budget_for(url_name)
+    if budget is not None and recorder.count > budget:
+        found.append(f'{url_name}: {recorder.count} queries, budget is {budget}')
+    for shape, n in recorder.repeated_shapes().items():
+        found.append(f'{url_name}: possible N+1, {n} x {shape}')
+    return found
+
+
+def request_within_budget(client, path, method='get', budget=None, **kwargs):
+    """
+    Test helper: make a request with the test client and raise
+    QueryBudgetExceeded if the view goes over its BLOG_QUERY_BUDGETS entry
+    (or ``budget``) or repeats a query shape. Returns the response.
+    """
+    with QueryRecorder() as recorder:
+        response = getattr(client, method)(path, **kwargs)
+    url_name = response.resolver_match.url_name if response.resolver_match else path
+    found = problems(recorder, url_name, budget)
+    if found:
+        raise QueryBudgetExceeded('\n'.join(found))
+    return response
+
+
+class QueryInspectionMiddleware:
+    """
+    Log budget overruns and N+1 patterns for every request and add
+    X-Query-Count / X-Query-Time headers. Only active when DEBUG and
+    BLOG_QUERY_INSPECTION are both on.
+    """
+    def __init__(self, get_response):
+        if not (settings.DEBUG and settings.BLOG_QUERY_INSPECTION):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        url_name = match.url_name if match else request.path
+        for problem in problems(recorder, url_name):
+            logger.warning(problem)
+        response['X-Query-Count'] = str(recorder.count)
+        response['X-Query-Time'] = f'{recorder.duration * 1000:.1f}ms'
+        return response
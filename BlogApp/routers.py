@@ -0,0 +1,64 @@
+"""
+Primary/replica database routing.
+
+When REPLICA_DATABASE_URL is set, settings.DATABASES gains a 'replica'
+alias. ReplicaRoutingMiddleware marks GET/HEAD/OPTIONS requests as
+replica-safe, and PrimaryReplicaRouter then sends their reads there.
+Everything else reads from the primary: writes, unsafe requests,
+management commands and task workers.
+
+Read-your-writes: every unsafe request sets a cookie that keeps that
+client's reads on the primary for BLOG_READ_YOUR_WRITES_SECONDS, so people
+always see their own new post, comment, vote or follow while the replica
+catches up.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA = 'replica'
+
+_reads_from_replica = ContextVar('reads_from_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def set_replica_reads(enabled):
+    """Route this request's (context's) reads to the replica. Returns a token for reset."""
+    return _reads_from_replica.set(enabled)
+
+
+def reset_replica_reads(token):
+    _reads_from_replica.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside this block, e.g. right after writing a row."""
+    token = _reads_from_replica.set(False)
+    try:
+        yield
+    finally:
+        _reads_from_replica.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _reads_from_replica.get() and replica_configured():
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema through replication.
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,251 @@
+"""
+Full-text search over posts.
+
+The inverted index lives in a side table that is kept current by the Post
+save/delete signals (see signals.py):
+
+* SQLite: an FTS5 virtual table (rowid = post id), ranked with bm25().
+* PostgreSQL: a weighted tsvector per post behind a GIN index, ranked with
+  ts_rank_cd().
+
+Any other database falls back to icontains matching.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, connections, router, transaction
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+from .models import Post
+
+SQLITE_TABLE = 'blogapp_post_fts'
+POSTGRES_TABLE = 'blogapp_post_search'
+
+# Control characters used as highlight markers inside snippets, so the
+# snippet text can be HTML-escaped before the markers become <mark> tags.
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchHit:
+    def __init__(self, post, snippet):
+        self.post = post
+        self.snippet = snippet
+
+
+class SearchResults:
+    """
+    One page of ranked hits. Iterating yields SearchHit objects.
+    """
+    def __init__(self, hits, page, has_next):
+        self.hits = hits
+        self.page = page
+        self.has_next = has_next
+
+    @property
+    def has_previous(self):
+        return self.page > 1
+
+    @property
+    def next_page_number(self):
+        return self.page + 1
+
+    @property
+    def previous_page_number(self):
+        return self.page - 1
+
+    def __iter__(self):
+        return iter(self.hits)
+
+    def __len__(self):
+        return len(self.hits)
+
+
+def highlight(text):
+    """Escape a snippet and turn the highlight markers into <mark> tags."""
+    html = escape(text).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+    return mark_safe(html)
+
+
+# --- Backends ---
+
+class SQLiteBackend:
+    def index(self, cursor, rows):
+        cursor.executemany(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+        cursor.executemany(
+            f'INSERT INTO {SQLITE_TABLE} (rowid, title, content) VALUES (%s, %s, %s)', rows
+        )
+
+    def remove(self, cursor, post_id):
+        cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [post_id])
+
+    def clear(self, cursor):
+        cursor.execute(f'DELETE FROM {SQLITE_TABLE}')
+
+    def match_expression(self, query):
+        # Quote every token so user input can't inject FTS5 syntax;
+        # the last one is a prefix match so partial words still hit.
+        tokens = TOKEN_RE.findall(query)
+        if not tokens:
+            return None
+        terms = [f'"{token}"' for token in tokens]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, cursor, query, limit, offset):
+        expression = self.match_expression(query)
+        if expression is None:
+            return []
+        cursor.execute(
+            f"""
+            SELECT rowid, snippet({SQLITE_TABLE}, -1, %s, %s, '…', 24)
+            FROM {SQLITE_TABLE}
+            WHERE {SQLITE_TABLE} MATCH %s
+            ORDER BY bm25({SQLITE_TABLE}, 10.0, 1.0)
+            LIMIT %s OFFSET %s
+            """,
+            [MARK_START, MARK_END, expression, limit, offset],
+        )
+        return cursor.fetchall()
+
+
+class PostgresBackend:
+    document_sql = (
+        "setweight(to_tsvector('english', %s), 'A') || "
+        "setweight(to_tsvector('english', %s), 'B')"
+    )
+
+    def index(self, cursor, rows):
+        cursor.executemany(
+            f"""
+            INSERT INTO {POSTGRES_TABLE} (post_id, document)
+            VALUES (%s, {self.document_sql})
+            ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document
+            """,
+            rows,
+        )
+
+    def remove(self, cursor, post_id):
+        cursor.execute(f'DELETE FROM {POSTGRES_TABLE} WHERE post_id = %s', [post_id])
+
+    def clear(self, cursor):
+        cursor.execute(f'TRUNCATE {POSTGRES_TABLE}')
+
+    def search(self, cursor, query, limit, offset):
+        # Rank and page first, then build headlines for the page only.
+        post_table = connection.ops.quote_name(Post._meta.db_table)
+        options = f'StartSel={MARK_START}, StopSel={MARK_END}, MaxWords=35, MinWords=15'
+        cursor.execute(
+            f"""
+            WITH q AS (SELECT websearch_to_tsquery('english', %s) AS query),
+            ranked AS (
+                SELECT s.post_id, ts_rank_cd(s.document, q.query) AS rank
+                FROM {POSTGRES_TABLE} s, q
+                WHERE s.document @@ q.query
+                ORDER BY rank DESC, s.post_id DESC
+                LIMIT %s OFFSET %s
+            )
+            SELECT ranked.post_id, ts_headline('english', p.content, q.query, %s)
+            FROM ranked
+            JOIN {post_table} p ON p.id = ranked.post_id, q
+            ORDER BY ranked.rank DESC, ranked.post_id DESC
+            """,
+            [query, limit, offset, options],
+        )
+        return cursor.fetchall()
+
+
+class FallbackBackend:
+    """Unindexed matching for databases without a full-text engine."""
+    def index(self, cursor, rows):
+        pass
+
+    def remove(self, cursor, post_id):
+        pass
+
+    def clear(self, cursor):
+        pass
+
+    def search(self, cursor, query, limit, offset):
+        posts = Post.objects.filter(
+            Q(title__icontains=query) | Q(content__icontains=query)
+        ).order_by('-created_at', '-id').values_list('id', 'content')[offset:offset + limit]
+        return [(pk, Truncator(content).words(30)) for pk, content in posts]
+
+
+def get_backend(conn=connection):
+    if conn.vendor == 'sqlite':
+        return SQLiteBackend()
+    if conn.vendor == 'postgresql':
+        return PostgresBackend()
+    return FallbackBackend()
+
+
+# --- Public API ---
+
+def index_posts(posts):
+    """Add or refresh the index entries for the given posts."""
+    rows = [(post.pk, post.title, post.content) for post in posts]
+    if rows:
+        with connection.cursor() as cursor:
+            get_backend().index(cursor, rows)
+
+
+def index_post(post):
+    index_posts([post])
+
+
+def remove_post(post_id):
+    with connection.cursor() as cursor:
+        get_backend().remove(cursor, post_id)
+
+
+def rebuild_index(batch_size=1000):
+    """
+    Re-index every post in one transaction, streaming rows in batches.
+    Returns the number of posts indexed.
+    """
+    backend = get_backend()
+    total = 0
+    rows = Post.objects.order_by('pk').values_list('pk', 'title', 'content').iterator(chunk_size=batch_size)
+    with transaction.atomic(), connection.cursor() as cursor:
+        backend.clear(cursor)
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                backend.index(cursor, batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            backend.index(cursor, batch)
+            total += len(batch)
+    return total
+
+
+def search_posts(query, page=1, per_page=10):
+    """
+    Return a SearchResults page for ``query``, best matches first. ``page``
+    is clamped to 1..BLOG_SEARCH_MAX_PAGE.
+    """
+    page = min(max(page, 1), settings.BLOG_SEARCH_MAX_PAGE)
+    offset = (page - 1) * per_page
+    # Searches are reads, so they follow the router (the replica when routed there).
+    conn = connections[router.db_for_read(Post)]
+    with conn.cursor() as cursor:
+        rows = get_backend(conn).search(cursor, query, per_page + 1, offset)
+
+    has_next = len(rows) > per_page and page < settings.BLOG_SEARCH_MAX_PAGE
+    rows = rows[:per_page]
+    posts = Post.objects.for_listing().in_bulk([pk for pk, _ in rows])
+    hits = [
+        SearchHit(posts[pk], highlight(snippet))
+        for pk, snippet in rows
+        if pk in posts
+    ]
+    return SearchResults(hits, page, has_next)
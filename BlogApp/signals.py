@@ -1,19 +1,271 @@
-from django.db.models.signals import post_save
-from django.contrib.auth.models import User
+from django.db.models import F, QuerySet
+from django.db.models.expressions import Combinable
+from django.db.models.signals import m2m_changed, post_init, post_save, post_delete, pre_delete, pre_save
+from django.contrib.auth.models import Group, User
+from django.contrib.auth.signals import user_logged_in
 from django.dispatch import receiver
-from .models import Profile
+from django.utils import timezone
+from .models import AuthorStats, Comment, Post, Profile
+from . import feed, identity, images, media, search, stats, trending, usernames, votes
+from .votes import vote_changed
 
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
     """
-    Create a profile for every new user.
+    Create the profile and stats rows of every new user. Later saves of the
+    user (logins, admin edits) don't touch them; users created without this
+    signal are fixed by `manage.py backfill_profiles`.
     """
     if created:
-        Profile.objects.create(user=instance)
+        # get_or_create: fixtures may load the rows together with the user.
+        instance.profile, _ = Profile.objects.get_or_create(user=instance)
+        AuthorStats.objects.get_or_create(user=instance)
 
 @receiver(post_save, sender=User)
-def save_profile(sender, instance, **kwargs):
+def remember_username(sender, instance, **kwargs):
     """
-    Save the profile whenever the user object is saved.
+    Teach this process's username filter about new and renamed users.
     """
-    instance.profile.save()
\ No newline at end of file
+    usernames.remember(instance.username)
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, update_fields=None, **kwargs):
+    """
+    Keep the full-text search index in step with post edits. Saves of
+    other fields only (cover variants, counters) leave the index alone.
+    """
+    if update_fields is not None and not {'title', 'content'} & update_fields:
+        return
+    search.index_post(instance)
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    """
+    Deliver new posts to the timelines of the author's followers.
+    """
+    if created:
+        feed.schedule_fan_out(instance)
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    """
+    Drop deleted posts from the full-text search index.
+    """
+    search.remove_post(instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+def bump_post_revision(sender, instance, update_fields=None, **kwargs):
+    """
+    A saved edit invalidates the cached fragments of the post. The revision
+    is incremented in the database: an instance loaded before a vote or
+    comment bumped it would otherwise write back a revision already used.
+    """
+    if instance.pk is not None and (update_fields is None or 'revision' in update_fields):
+        instance.revision = F('revision') + 1
+
+@receiver(post_save, sender=Post)
+def reload_post_revision(sender, instance, **kwargs):
+    if isinstance(instance.revision, Combinable):
+        instance.refresh_from_db(fields=['revision'])
+
+def deleted_with_post(origin):
+    """
+    True when a delete signal is part of a Post cascade, where per-row
+    bookkeeping on the post would be wasted work.
+    """
+    if isinstance(origin, Post):
+        return True
+    return isinstance(origin, QuerySet) and origin.model is Post
+
+def count_comment(post_id, delta):
+    """
+    Change the post's comment count and trending score in one UPDATE, which
+    also invalidates its cached comment list. The score is computed from the
+    counts read just before; a vote landing in between is picked up by the
+    next vote or decay_trending run.
+    """
+    counts = Post.objects.filter(pk=post_id).values(*trending.SCORE_FIELDS).first()
+    if counts is None:
+        return
+    counts['comment_count'] += delta
+    Post.objects.filter(pk=post_id).update(
+        comment_count=F('comment_count') + delta, revision=F('revision') + 1,
+        updated_at=timezone.now(), trending_score=trending.score(**counts),
+    )
+
+@receiver(post_save, sender=Comment)
+def count_comment_on_post(sender, instance, created, **kwargs):
+    """
+    New comments are counted and rescored on the post.
+    """
+    if created:
+        count_comment(instance.post_id, 1)
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment_on_post(sender, instance, origin=None, **kwargs):
+    """
+    Removed comments are uncounted and rescored on the post.
+    """
+    if not deleted_with_post(origin):
+        count_comment(instance.post_id, -1)
+
+
+# --- Author stats ---
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        stats.adjust(stats.for_user(instance.author_id), post_count=1)
+
+@receiver(pre_delete, sender=Post)
+def uncount_deleted_post(sender, instance, **kwargs):
+    """
+    Subtracts the post and everything counted on it from its author's stats.
+    """
+    # Read the counters from the row; the instance may predate recent votes and comments.
+    like_count, comment_count = Post.objects.filter(pk=instance.pk).values_list(
+        'like_count', 'comment_count'
+    ).first() or (0, 0)
+    stats.adjust(
+        stats.for_user(instance.author_id),
+        post_count=-1,
+        total_likes=-like_count,
+        total_comments=-comment_count,
+    )
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        stats.adjust(stats.for_post_author(instance.post_id), total_comments=1)
+
+@receiver(post_delete, sender=Comment)
+def uncount_deleted_comment(sender, instance, origin=None, **kwargs):
+    # Post deletions already subtracted all their comments in one go.
+    if not deleted_with_post(origin):
+        stats.adjust(stats.for_post_author(instance.post_id), total_comments=-1)
+
+@receiver(pre_delete, sender=User)
+def uncount_deleted_users_votes(sender, instance, **kwargs):
+    votes.forget_votes_of(instance.pk)
+    stats.forget_likes_of(instance.pk)
+
+@receiver(vote_changed)
+def count_vote(sender, post_id, deltas, **kwargs):
+    stats.adjust(stats.for_post_author(post_id), total_likes=deltas.get('like_count', 0))
+
+@receiver(m2m_changed, sender=Profile.following.through)
+def count_follows(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep follower/following counts in step with Profile.following,
+    whichever side of the relation is edited.
+    """
+    if action == 'pre_clear':
+        # pk_set is not provided for clear(), so look up what is about to go.
+        related = instance.followers if reverse else instance.following
+        pk_set = set(related.values_list('pk', flat=True))
+        sign = -1
+    elif action in ('post_add', 'post_remove'):
+        sign = 1 if action == 'post_add' else -1
+    else:
+        return
+    if not pk_set:
+        return
+
+    change = sign * len(pk_set)
+    if reverse:
+        # instance gained/lost followers; each profile in pk_set follows one more/less.
+        stats.adjust(stats.for_profiles([instance.pk]), follower_count=change)
+        stats.adjust(stats.for_profiles(pk_set), following_count=sign)
+    else:
+        stats.adjust(stats.for_profiles([instance.pk]), following_count=change)
+        stats.adjust(stats.for_profiles(pk_set), follower_count=sign)
+
+@receiver(pre_delete, sender=Profile)
+def unfollow_deleted_profile(sender, instance, **kwargs):
+    """
+    Deleting a profile (or its user) cascades its follow rows without
+    m2m_changed; clearing them first lets count_follows see them go.
+    """
+    instance.following.clear()
+    instance.followers.clear()
+
+
+# --- Trending scores ---
+
+# Comments are rescored by count_comment(), in the same UPDATE as the count.
+
+@receiver(vote_changed)
+def rescore_voted_post(sender, post_id, counts, **kwargs):
+    trending.update_score(post_id, counts)
+
+
+# --- Cached group membership ---
+
+def bump_groups_version(user_ids):
+    Profile.objects.filter(user_id__in=user_ids).update(groups_version=F('groups_version') + 1)
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalidate the group names cached in sessions (see identity.py) when
+    users join or leave groups, from either side of the relation.
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            bump_groups_version([instance.pk])
+    elif action == 'pre_clear':
+        bump_groups_version(instance.user_set.values('pk'))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        bump_groups_version(pk_set)
+
+@receiver(user_logged_in)
+def cache_groups_on_login(sender, request, user, **kwargs):
+    # So the first pages after logging in don't have to look them up.
+    if request is not None and hasattr(request, 'session'):
+        identity.remember_groups(request, user)
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_renamed_or_deleted(sender, instance, created=False, **kwargs):
+    # Deleting a group removes its members without an m2m_changed signal.
+    if not created:
+        bump_groups_version(instance.user_set.values('pk'))
+
+
+# --- Image variants ---
+
+@receiver(post_save, sender=Post)
+def make_cover_variants(sender, instance, **kwargs):
+    images.schedule_variants(instance, 'cover_image')
+
+@receiver(post_save, sender=Profile)
+def make_profile_pic_variants(sender, instance, **kwargs):
+    images.schedule_variants(instance, 'profile_pic')
+
+
+# --- Media references ---
+
+@receiver(post_init, sender=Post)
+@receiver(post_init, sender=Profile)
+def remember_media_names(sender, instance, **kwargs):
+    media.remember_names(instance)
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Profile)
+def load_media_names(sender, instance, **kwargs):
+    media.load_missing_names(instance)
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Profile)
+def count_media_refs(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Keep MediaBlob.ref_count in step with the image fields; drift (raw
+    UPDATEs, crashes) is fixed by `manage.py gc_media --recount`.
+    """
+    media.count_saved_names(instance, created, update_fields)
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Profile)
+def uncount_media_refs(sender, instance, **kwargs):
+    media.count_deleted_names(instance)
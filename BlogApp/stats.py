@@ -0,0 +1,180 @@
+"""
+Denormalized author statistics.
+
+AuthorStats holds the totals shown on profile pages. The signal handlers
+in signals.py adjust them with F() expressions in the same transaction as
+the change they count, and recompute() rebuilds them exactly from the
+underlying tables. recompute_post_counters() does the same for the vote
+and comment counts stored on each Post.
+"""
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.db.models import Count, F, Subquery
+from django.utils import timezone
+
+from . import trending
+from .models import AuthorStats, Comment, Post, Profile
+from .routers import use_primary
+
+STAT_FIELDS = ('post_count', 'total_likes', 'total_comments', 'follower_count', 'following_count')
+POST_COUNTERS = ('like_count', 'dislike_count', 'comment_count')
+
+Follow = Profile.following.through
+
+
+def adjust(queryset, **deltas):
+    """
+    Apply counter deltas to the AuthorStats rows in ``queryset``.
+    Returns the number of rows updated.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    return queryset.update(**{field: F(field) + delta for field, delta in deltas.items()})
+
+
+def for_user(user_id):
+    return AuthorStats.objects.filter(user_id=user_id)
+
+
+def for_post_author(post_id):
+    """The stats row of a post's author, as one UPDATE-able queryset."""
+    return AuthorStats.objects.filter(
+        user_id=Subquery(Post.objects.filter(pk=post_id).values('author_id'))
+    )
+
+
+def for_profiles(profile_ids):
+    return AuthorStats.objects.filter(user__profile__in=profile_ids)
+
+
+def forget_likes_of(user_id):
+    """
+    Take the likes of a user about to be deleted off the total_likes of the
+    authors they liked. Their like rows go in the cascade, without signals.
+    """
+    per_author = (
+        Post.likes.through.objects.filter(user_id=user_id).exclude(post__author_id=user_id)
+        .values_list('post__author_id').annotate(n=Count('pk')).order_by()
+    )
+    by_count = defaultdict(list)
+    for author_id, n in per_author:
+        by_count[n].append(author_id)
+    for n, author_ids in by_count.items():
+        adjust(AuthorStats.objects.filter(user_id__in=author_ids), total_likes=-n)
+
+
+def get_stats(user):
+    """
+    Return the AuthorStats row for ``user``, rebuilding it if it is missing.
+    """
+    try:
+        return AuthorStats.objects.get(user=user)
+    except AuthorStats.DoesNotExist:
+        recompute(user_ids=[user.pk])
+        with use_primary():  # The replica may not have the new row yet
+            return AuthorStats.objects.get(user=user)
+
+
+async def aget_stats(user):
+    """Async version of get_stats()."""
+    try:
+        return await AuthorStats.objects.aget(user=user)
+    except AuthorStats.DoesNotExist:
+        await sync_to_async(recompute)(user_ids=[user.pk])
+        with use_primary():
+            return await AuthorStats.objects.aget(user=user)
+
+
+def _grouped_counts(queryset, group_field, user_ids):
+    rows = (
+        queryset.filter(**{f'{group_field}__in': user_ids})
+        .values(group_field).annotate(n=Count('pk')).values_list(group_field, 'n')
+        .order_by()
+    )
+    return dict(rows)
+
+
+def compute(user_ids):
+    """Compute exact stats for the given users, one grouped query per counter."""
+    counts = {
+        'post_count': _grouped_counts(Post.objects, 'author_id', user_ids),
+        'total_likes': _grouped_counts(Post.likes.through.objects, 'post__author_id', user_ids),
+        'total_comments': _grouped_counts(Comment.objects, 'post__author_id', user_ids),
+        'follower_count': _grouped_counts(Follow.objects, 'to_profile__user_id', user_ids),
+        'following_count': _grouped_counts(Follow.objects, 'from_profile__user_id', user_ids),
+    }
+    return [
+        AuthorStats(user_id=user_id, **{field: counts[field].get(user_id, 0) for field in STAT_FIELDS})
+        for user_id in user_ids
+    ]
+
+
+def recompute(user_ids=None, batch_size=1000):
+    """
+    Recompute stats for ``user_ids`` (default: every user) in batches and
+    write back only the rows that drifted. Returns the number of rows fixed.
+    """
+    if user_ids is None:
+        user_ids = User.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=batch_size)
+    return _in_batches(user_ids, batch_size, _reconcile)
+
+
+def recompute_post_counters(batch_size=1000):
+    """
+    Recount every post's like_count, dislike_count and comment_count from
+    the vote and comment tables, writing back only the posts that drifted.
+    Returns the number of posts fixed.
+    """
+    post_ids = Post.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=batch_size)
+    return _in_batches(post_ids, batch_size, _reconcile_posts)
+
+
+def _in_batches(ids, batch_size, reconcile):
+    fixed = 0
+    batch = []
+    for pk in ids:
+        batch.append(pk)
+        if len(batch) >= batch_size:
+            fixed += reconcile(batch)
+            batch = []
+    if batch:
+        fixed += reconcile(batch)
+    return fixed
+
+
+def _reconcile(user_ids):
+    current = {
+        row[0]: row[1:]
+        for row in AuthorStats.objects.filter(user_id__in=user_ids).values_list('user_id', *STAT_FIELDS)
+    }
+    changed = [
+        stats for stats in compute(user_ids)
+        if current.get(stats.user_id) != tuple(getattr(stats, field) for field in STAT_FIELDS)
+    ]
+    AuthorStats.objects.bulk_create(
+        changed, update_conflicts=True, unique_fields=['user'], update_fields=STAT_FIELDS,
+    )
+    return len(changed)
+
+
+def _reconcile_posts(post_ids):
+    counts = {
+        'like_count': _grouped_counts(Post.likes.through.objects, 'post_id', post_ids),
+        'dislike_count': _grouped_counts(Post.dislikes.through.objects, 'post_id', post_ids),
+        'comment_count': _grouped_counts(Comment.objects, 'post_id', post_ids),
+    }
+    now = timezone.now()
+    changed = []
+    rows = Post.objects.filter(pk__in=post_ids).values_list('pk', 'created_at', *POST_COUNTERS)
+    for pk, created_at, *current in rows:
+        exact = dict(zip(POST_COUNTERS, (counts[field].get(pk, 0) for field in POST_COUNTERS)))
+        if current != list(exact.values()):
+            changed.append(Post(
+                pk=pk, revision=F('revision') + 1, updated_at=now,
+                trending_score=trending.score(created_at=created_at, now=now, **exact), **exact,
+            ))
+    Post.objects.bulk_update(changed, [*POST_COUNTERS, 'revision', 'updated_at', 'trending_score'])
+    return len(changed)
@@ -0,0 +1,90 @@
+"""
+The storage backend of uploaded images (STORAGES['media']).
+
+Files are saved under the SHA-256 of their content, computed while the
+upload is copied to a temporary file, and an upload whose content is
+already stored isn't written again. Each stored file has a MediaBlob row;
+reference counting and garbage collection are in media.py.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+
+BLOB_DIR = 'blobs'
+TMP_DIR = 'tmp'
+# Added to a blob's file name while gc_media deletes it (see media.py).
+TRASH_SUFFIX = '.deleting'
+# Names saved as given: they are derived from a blob's name already.
+DERIVED_PREFIXES = ('variants/',)
+
+BLOB_NAME = re.compile(rf'^{BLOB_DIR}/[0-9a-f]{{2}}/[0-9a-f]{{64}}(\.[0-9a-z]+)?$')
+
+
+def is_blob(name):
+    return bool(name) and BLOB_NAME.match(name) is not None
+
+
+def is_internal(name):
+    """Files that are not media: partial uploads and blobs being deleted."""
+    return name.startswith(f'{TMP_DIR}/') or name.endswith(TRASH_SUFFIX)
+
+
+def blob_name(digest, original_name):
+    extension = os.path.splitext(original_name)[1].lower()
+    return f'{BLOB_DIR}/{digest[:2]}/{digest}{extension}'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that saves files under the hash of their content and
+    keeps one copy of each distinct file.
+    """
+    def get_available_name(self, name, max_length=None):
+        if name.startswith(DERIVED_PREFIXES):
+            return super().get_available_name(name, max_length)
+        # The final name comes from the content; see _save().
+        return name
+
+    def _save(self, name, content):
+        if name.startswith(DERIVED_PREFIXES):
+            return super()._save(name, content)
+
+        tmp_dir = self.path(TMP_DIR)
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            digest = hashlib.sha256()
+            size = 0
+            with os.fdopen(fd, 'wb') as f:
+                if hasattr(content, 'seek') and content.seekable():
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+
+            name = blob_name(digest.hexdigest(), name)
+            path = self.path(name)
+            # Touching the row first keeps gc_media off a blob that is being
+            # uploaded again (see collect_garbage()).
+            MediaBlob = apps.get_model('BlogApp', 'MediaBlob')
+            known = MediaBlob.objects.filter(name=name).update(saved_at=timezone.now())
+            if not known or not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                os.replace(tmp_path, path)
+                if not known:
+                    MediaBlob.objects.get_or_create(name=name, defaults={'size': size})
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return name
+
+    def is_immutable(self, name):
+        return is_blob(name)
@@ -0,0 +1,194 @@
+"""
+Atom and RSS feeds of the latest posts, for the whole site or one author.
+
+A feed's version is the (id, edited_at, author) of its latest
+BLOG_SYNDICATION_ENTRIES posts, read through the (created_at, id) index
+with one small query. edited_at only moves when a title or body is
+edited, so votes and comments don't invalidate feeds. That version is the
+feed's ETag, so readers polling an unchanged feed get a 304 after that one
+query. It also keys the cached rendering of those entries, so a changed
+feed is rendered once and then served from the cache.
+
+?all=1 asks for every post. That document is not cached; it is streamed in
+batches straight from a queryset iterator, so memory use doesn't grow with
+the archive. Its version is the newest edited_at and the number of posts,
+an aggregate over the whole archive that costs less than the document.
+"""
+import io
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, Max
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.html import escape
+from django.utils.http import http_date
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from .conditional import make_etag
+from .models import Post
+
+# Entries rendered and streamed at a time for ?all=1.
+STREAM_BATCH = 100
+
+
+class StreamingFeedMixin:
+    """
+    Write a feed in pieces: the document up to its first entry, entries as
+    they are added, then the closing tags. The feed's <updated>/<lastBuildDate> comes from ``updated``
+    instead of from the items, which are never all in memory.
+    """
+    items_end = None  # The closing tag that entries are written before
+
+    def __init__(self, *args, updated=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.updated = updated
+
+    def latest_post_date(self):
+        return self.updated or super().latest_post_date()
+
+    def head_and_tail(self):
+        document = self.writeString('utf-8')
+        split = document.rindex(self.items_end)
+        return document[:split], document[split:]
+
+    def drain(self):
+        """The XML of the items added since the last drain()."""
+        out = io.StringIO()
+        self.write_items(SimplerXMLGenerator(out, 'utf-8', short_empty_elements=True))
+        self.items.clear()
+        return out.getvalue()
+
+
+class AtomFeed(StreamingFeedMixin, Atom1Feed):
+    items_end = '</feed>'
+
+
+class RssFeed(StreamingFeedMixin, Rss201rev2Feed):
+    items_end = '</channel>'
+
+
+FEED_TYPES = {'atom': AtomFeed, 'rss': RssFeed}
+
+
+class FeedWriter:
+    def __init__(self, request, feed, full):
+        self.request = request
+        self.feed = feed
+        self.full = full
+        self.head, self.tail = feed.head_and_tail()
+
+    def add(self, post):
+        """Add a post; returns a chunk of XML when a batch is full, else ''."""
+        link = self.request.build_absolute_uri(reverse('post_detail', args=[post.pk]))
+        self.feed.add_item(
+            title=post.title,
+            link=link,
+            # The excerpt is plain text; both formats expect HTML here.
+            description=post.content_html if self.full else escape(post.excerpt),
+            author_name=post.author.username,
+            author_link=self.request.build_absolute_uri(
+                reverse('public_profile', args=[post.author.username])),
+            pubdate=post.created_at,
+            updateddate=post.edited_at,
+            unique_id=link,
+            unique_id_is_permalink=True,
+        )
+        if self.feed.num_items() >= STREAM_BATCH:
+            return self.feed.drain()
+        return ''
+
+    def chunks(self, posts):
+        yield self.head.encode()
+        for post in posts:
+            chunk = self.add(post)
+            if chunk:
+                yield chunk.encode()
+        yield (self.feed.drain() + self.tail).encode()
+
+    async def achunks(self, posts):
+        yield self.head.encode()
+        async for post in posts:
+            chunk = self.add(post)
+            if chunk:
+                yield chunk.encode()
+        yield (self.feed.drain() + self.tail).encode()
+
+
+def feed_posts(author=None, full=False):
+    posts = Post.objects.select_related('author').only(
+        'title', 'content_html' if full else 'excerpt', 'created_at', 'edited_at', 'author__username',
+    )
+    if author is not None:
+        posts = posts.filter(author=author)
+    return posts.order_by('-created_at', '-id')
+
+
+def build_feed(request, feed_type, author, updated):
+    if author is None:
+        title = 'Django Blog'
+        link = reverse('post_list')
+        description = 'The latest posts.'
+    else:
+        title = f'Django Blog: {author.username}'
+        link = reverse('public_profile', args=[author.username])
+        description = f'The latest posts by {author.username}.'
+    return FEED_TYPES[feed_type](
+        title=title,
+        link=request.build_absolute_uri(link),
+        description=description,
+        feed_url=request.build_absolute_uri(),
+        language='en',
+        updated=updated,
+    )
+
+
+async def feed_response(request, feed_type, author=None):
+    """The feed as a response: 304, cached, rendered or (for ?all=1) streamed."""
+    full = settings.BLOG_SYNDICATION_FULL_CONTENT or bool(request.GET.get('full'))
+    archive = bool(request.GET.get('all'))
+    posts = feed_posts(author, full)
+
+    if archive:
+        version = await posts.order_by().aaggregate(newest=Max('edited_at'), count=Count('id'))
+        newest = version['newest']
+    else:
+        version = [row async for row in posts.values_list('pk', 'edited_at', 'author__username')
+                   [:settings.BLOG_SYNDICATION_ENTRIES]]
+        newest = max((edited_at for _, edited_at, _ in version), default=None)
+    # Absolute URLs are part of the document, so the host is part of its identity.
+    etag = make_etag('feed', feed_type, getattr(author, 'pk', None), full, archive,
+                     request.build_absolute_uri('/'), version)
+    last_modified = int(newest.timestamp()) if newest else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        content_type = FEED_TYPES[feed_type].content_type
+        if archive:
+            writer = FeedWriter(request, build_feed(request, feed_type, author, newest), full)
+            # An async iterator under ASGI; Django would otherwise read a sync
+            # one into a list before sending it.
+            if isinstance(request, ASGIRequest):
+                content = writer.achunks(posts.aiterator(chunk_size=STREAM_BATCH))
+            else:
+                content = writer.chunks(posts.iterator(chunk_size=STREAM_BATCH))
+            response = StreamingHttpResponse(content, content_type=content_type)
+        else:
+            cache_key = 'syndication:' + etag.strip('"')
+            document = await cache.aget(cache_key)
+            if document is None:
+                writer = FeedWriter(request, build_feed(request, feed_type, author, newest), full)
+                entries = [post async for post in posts[:settings.BLOG_SYNDICATION_ENTRIES]]
+                document = b''.join(writer.chunks(entries))
+                await cache.aset(cache_key, document, settings.BLOG_SYNDICATION_CACHE_TIMEOUT)
+            response = HttpResponse(document, content_type=content_type)
+
+    if response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+    patch_cache_control(response, public=True, max_age=settings.BLOG_SYNDICATION_MAX_AGE)
+    return response
@@ -0,0 +1,214 @@
+"""
+A small database-backed task queue.
+
+Work that doesn't have to finish before the response is sent is registered
+with the @task decorator and queued with enqueue(). Tasks are rows in the
+Task table of the main database, so no broker is needed; they are written in
+the caller's transaction and only become visible to workers once it commits.
+`manage.py run_tasks` claims and runs them.
+
+With BLOG_TASKS_EAGER on (development only), enqueue() also claims and runs
+the task in-process right after the transaction commits. It goes through
+the same claim() and execute() as a worker, so idempotency keys, attempts
+and retries behave the same; a failed task is left queued for its retry.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+class RegisteredTask:
+    def __init__(self, func, name, max_attempts, priority):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.priority = priority
+
+    def __call__(self, **payload):
+        return self.func(**payload)
+
+    def enqueue(self, idempotency_key=None, delay=None, priority=None, **payload):
+        return enqueue(self.name, payload, idempotency_key=idempotency_key,
+                       delay=delay, priority=priority)
+
+
+def task(name, max_attempts=3, priority=0):
+    """
+    Register a function as a task. It is called with the payload as keyword
+    arguments, so payloads must be JSON-serializable.
+    """
+    def decorator(func):
+        registered = RegisteredTask(func, name, max_attempts, priority)
+        _registry[name] = registered
+        return registered
+    return decorator
+
+
+def enqueue(name, payload=None, idempotency_key=None, delay=None, priority=None):
+    """
+    Queue task ``name``. Returns the Task row.
+    With an idempotency key, a pending (queued or running) task with that key
+    is returned instead of creating a second one; keys are released once the
+    task finishes.
+    """
+    task_row = _create(_registry[name], payload or {}, idempotency_key, delay, priority)
+    if settings.BLOG_TASKS_EAGER and not delay:
+        transaction.on_commit(lambda: _run_eagerly(task_row.pk))
+    return task_row
+
+
+def _create(registered, payload, idempotency_key, delay, priority):
+    fields = {
+        'name': registered.name,
+        'payload': payload,
+        'priority': registered.priority if priority is None else priority,
+        'max_attempts': registered.max_attempts,
+        'run_at': timezone.now() + (delay or timedelta()),
+    }
+    if idempotency_key is None:
+        return Task.objects.create(**fields)
+    try:
+        with transaction.atomic():
+            return Task.objects.create(idempotency_key=idempotency_key, **fields)
+    except IntegrityError:
+        return Task.objects.get(idempotency_key=idempotency_key)
+
+
+def _run_eagerly(pk):
+    task_row = claim(worker_id(), pk=pk)
+    if task_row is not None:
+        execute(task_row)
+
+
+# --- Worker side ---
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def claim(worker, pk=None):
+    """
+    Mark the next runnable task (or task ``pk``, if it is runnable) as
+    running and return it, or None if there is none. The conditional UPDATE
+    makes the claim safe with any number of concurrent workers on every
+    database backend.
+    """
+    now = timezone.now()
+    if pk is not None:
+        candidates = [pk]
+    else:
+        candidates = (
+            Task.objects.filter(status=Task.QUEUED, run_at__lte=now)
+            .order_by('-priority', 'run_at', 'pk')
+            .values_list('pk', flat=True)[:10]
+        )
+    for pk in candidates:
+        claimed = Task.objects.filter(pk=pk, status=Task.QUEUED, run_at__lte=now).update(
+            status=Task.RUNNING, locked_by=worker, locked_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def execute(task_row):
+    """Run a claimed task and record the outcome, scheduling a retry on failure."""
+    registered = _registry.get(task_row.name)
+    try:
+        if registered is None:
+            raise LookupError(f'No task registered as {task_row.name!r}')
+        registered(**task_row.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Task %s (%s) failed on attempt %s', task_row.name, task_row.pk, task_row.attempts)
+        if task_row.attempts >= task_row.max_attempts:
+            _record(task_row, status=Task.FAILED, last_error=error, finished_at=timezone.now(),
+                    idempotency_key=None)
+        else:
+            # Exponential backoff: base delay, then 2x, 4x, ...
+            backoff = settings.BLOG_TASKS_RETRY_DELAY * 2 ** (task_row.attempts - 1)
+            _record(task_row, status=Task.QUEUED, last_error=error,
+                    run_at=timezone.now() + timedelta(seconds=backoff))
+        return False
+
+    _record(task_row, status=Task.DONE, finished_at=timezone.now(), idempotency_key=None)
+    return True
+
+
+def _record(task_row, **fields):
+    """
+    Write the outcome of a run, unless the task was requeued as stale while
+    it ran (and maybe claimed again): that run's outcome is the one kept.
+    """
+    updated = Task.objects.filter(
+        pk=task_row.pk, status=Task.RUNNING, locked_by=task_row.locked_by,
+    ).update(**fields)
+    if not updated:
+        logger.warning('Task %s (%s) was requeued while it ran; outcome not recorded',
+                       task_row.name, task_row.pk)
+
+
+def requeue_stale():
+    """
+    Put back tasks whose worker died mid-run, or fail them if that was
+    their last attempt. Returns how many were requeued.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.BLOG_TASKS_STALE_AFTER)
+    stale = Task.objects.filter(status=Task.RUNNING, locked_at__lt=cutoff)
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Task.FAILED, last_error='Worker lost during the last attempt.',
+        finished_at=timezone.now(), idempotency_key=None,
+    )
+    return stale.update(status=Task.QUEUED)
+
+
+def purge_finished():
+    """Delete done and failed tasks that finished more than BLOG_TASKS_RETENTION_DAYS ago."""
+    cutoff = timezone.now() - timedelta(days=settings.BLOG_TASKS_RETENTION_DAYS)
+    deleted, _ = Task.objects.filter(status__in=(Task.DONE, Task.FAILED), finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def work(stop_event, poll_interval=1.0, once=False):
+    """
+    Claim and run tasks until ``stop_event`` is set (or, with ``once``,
+    until the queue is empty). Tasks of dead workers are requeued every
+    BLOG_TASKS_REQUEUE_INTERVAL seconds. Returns the number of tasks run.
+    """
+    worker = worker_id()
+    count = 0
+    next_requeue = time.monotonic()
+    try:
+        while not stop_event.is_set():
+            close_old_connections()
+            if time.monotonic() >= next_requeue:
+                requeued = requeue_stale()
+                if requeued:
+                    logger.warning('Requeued %s stale tasks', requeued)
+                next_requeue = time.monotonic() + settings.BLOG_TASKS_REQUEUE_INTERVAL
+            task_row = claim(worker)
+            if task_row is None:
+                if once:
+                    break
+                stop_event.wait(poll_interval)
+                continue
+            execute(task_row)
+            count += 1
+    finally:
+        close_old_connections()
+    return count
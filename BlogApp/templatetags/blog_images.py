@@ -0,0 +1,38 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+
+def _srcset(storage, names):
+    return ', '.join(
+        f'{storage.url(name)} {width}w'
+        for width, name in sorted(names.items(), key=lambda item: int(item[0]))
+    )
+
+
+@register.simple_tag
+def responsive_image(field_file, variants, sizes='100vw', **attrs):
+    """
+    Render an image field as <picture> with WebP and JPEG srcsets, falling
+    back to a plain <img> of the original until the variants exist.
+
+    Usage: {% responsive_image post.cover_image post.cover_variants sizes="200px" alt=post.title class="post-list-img" %}
+    """
+    attrs.setdefault('loading', 'lazy')
+    attributes = format_html_join(' ', '{}="{}"', sorted(attrs.items()))
+
+    if not variants or variants.get('source') != field_file.name:
+        return format_html('<img src="{}" {}>', field_file.url, attributes)
+
+    storage = field_file.storage
+    jpeg = variants['jpeg']
+    largest = max(jpeg, key=int)
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" {}>'
+        '</picture>',
+        _srcset(storage, variants['webp']), sizes,
+        storage.url(jpeg[largest]), _srcset(storage, jpeg), sizes, attributes,
+    )
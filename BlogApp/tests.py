@@ -1,3 +1,858 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import threading
+import time
+from array import array
+from datetime import timedelta
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import feed, follows, images, media, search, stats, tasks, trending, usernames, votes
+from .forms import PostForm
+from .models import AuthorStats, Comment, FeedEntry, ImportCheckpoint, MediaBlob, Post, Profile, Task, media_storage
+from .pagination import decode_cursor, paginate_keyset
+from .querybudget import QueryBudgetExceeded, QueryRecorder, normalize, request_within_budget
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Every view stays within its BLOG_QUERY_BUDGETS entry and runs no query
+    shape repeatedly, with enough rows that per-row queries would show up.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.writer = User.objects.create_user('writer', password='pw')
+        cls.writer.groups.add(Group.objects.get_or_create(name='Writers')[0])
+        cls.readers = [User.objects.create_user(f'reader{i}', password='pw') for i in range(5)]
+        for reader in cls.readers:
+            reader.profile.following.add(cls.writer.profile)
+        cls.writer.profile.following.add(*[reader.profile for reader in cls.readers])
+
+        cls.posts = [
+            Post.objects.create(author=cls.writer, title=f'Post {i}', content=f'Body of post {i} about caching')
+            for i in range(12)
+        ]
+        for reader in cls.readers:
+            Comment.objects.create(post=cls.posts[-1], author=reader, body='Nice post')
+            cls.posts[-1].likes.add(reader)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.writer)
+
+    def assertWithinBudget(self, url, method='get', **kwargs):
+        return request_within_budget(self.client, url, method=method, **kwargs)
+
+    def test_post_list(self):
+        self.assertWithinBudget(reverse('post_list'))
+        self.client.logout()
+        self.assertWithinBudget(reverse('post_list'))
+
+    def test_trending(self):
+        self.assertWithinBudget(reverse('trending'))
+        self.assertWithinBudget(reverse('trending'), data={'window': 'week'})
+
+    def test_timeline(self):
+        self.client.force_login(self.readers[0])
+        self.assertWithinBudget(reverse('timeline'))
+
+    def test_post_detail(self):
+        self.assertWithinBudget(reverse('post_detail', args=[self.posts[-1].pk]))
+
+    def test_post_comments(self):
+        self.assertWithinBudget(reverse('post_comments', args=[self.posts[-1].pk]))
+
+    def test_my_posts(self):
+        self.assertWithinBudget(reverse('my_posts'))
+
+    def test_search(self):
+        self.assertWithinBudget(reverse('search_results'), data={'q': 'caching'})
+
+    def test_feeds(self):
+        self.client.logout()
+        for name in ('site_feed', 'site_feed_rss'):
+            self.assertWithinBudget(reverse(name))
+            self.assertWithinBudget(reverse(name), data={'all': 1, 'full': 1})
+        for name in ('author_feed', 'author_feed_rss'):
+            self.assertWithinBudget(reverse(name, args=[self.writer.username]))
+
+    def test_profiles(self):
+        self.assertWithinBudget(reverse('profile'))
+        self.assertWithinBudget(reverse('public_profile', args=[self.readers[0].username]))
+
+    def test_writer_pages(self):
+        self.assertWithinBudget(reverse('create_post'))
+        self.assertWithinBudget(reverse('update_post', args=[self.posts[0].pk]))
+        self.assertWithinBudget(reverse('delete_post', args=[self.posts[0].pk]))
+
+    def test_vote_and_follow(self):
+        self.assertWithinBudget(reverse('post_vote', args=[self.posts[0].pk]), method='post',
+                                data={'vote': 'like'})
+        self.assertWithinBudget(reverse('follow_user', args=[self.readers[0].username]), method='post')
+
+    def test_budget_overrun_fails(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.assertWithinBudget(reverse('post_list'), budget=1)
+
+
+class PaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('writer')
+        Post.objects.bulk_create(Post(author=author, title=f'Post {i}', content='Body') for i in range(25))
+        # Half of them share one timestamp, so only the id orders them.
+        same = Post.objects.order_by('pk').values_list('pk', flat=True)[5:18]
+        Post.objects.filter(pk__in=list(same)).update(created_at=Post.objects.get(pk=same[0]).created_at)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursors_walk_every_post_once_in_order(self):
+        seen, cursor, pages = [], None, []
+        while True:
+            page = paginate_keyset(Post.objects.all(), cursor=cursor, per_page=10)
+            pages.append(len(page))
+            seen += [post.pk for post in page]
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+            self.assertEqual(decode_cursor(cursor), (page.items[-1].created_at, page.items[-1].pk))
+        self.assertEqual(pages, [10, 10, 5])
+        self.assertEqual(seen, list(Post.objects.order_by('-created_at', '-id').values_list('pk', flat=True)))
+
+    def test_json_pages(self):
+        first = self.client.get(reverse('post_list'), {'format': 'json'}).json()
+        self.assertEqual(len(first['posts']), 10)
+        ids = [post['id'] for post in first['posts']]
+        cursor = first['next_cursor']
+        while cursor:
+            page = self.client.get(reverse('post_list'), {'format': 'json', 'cursor': cursor}).json()
+            ids += [post['id'] for post in page['posts']]
+            cursor = page['next_cursor']
+        self.assertEqual(sorted(ids), sorted(Post.objects.values_list('pk', flat=True)))
+        self.assertEqual(len(ids), 25)
+
+    def test_tampered_cursors_are_rejected(self):
+        valid = paginate_keyset(Post.objects.all(), per_page=10).next_cursor
+        # Garbage, a truncated cursor, and base64 of 'yesterday|1'.
+        for cursor in ('not a cursor', valid[:10], 'eWVzdGVyZGF5fDE'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('post_list'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+
+
+class PostEditTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.writer = User.objects.create_user('writer', password='pw')
+        self.writer.groups.add(Group.objects.get_or_create(name='Writers')[0])
+        self.post = Post.objects.create(author=self.writer, title='Post', content='Old body')
+
+    def test_saving_a_stale_instance_still_invalidates_the_body(self):
+        stale = Post.objects.get(pk=self.post.pk)
+        Post.objects.filter(pk=self.post.pk).update(revision=F('revision') + 1)  # e.g. a vote
+        self.assertContains(self.client.get(reverse('post_detail', args=[self.post.pk])), 'Old body')
+        stale.content = 'BRAND NEW BODY'
+        stale.save()
+        self.assertEqual(stale.revision, 2)
+        self.assertContains(self.client.get(reverse('post_detail', args=[self.post.pk])), 'BRAND NEW BODY')
+
+    def test_edit_keeps_counters_changed_since_loading(self):
+        self.client.force_login(self.writer)
+        votes.toggle_vote(self.post.pk, User.objects.create_user('reader'), votes.LIKE)
+        response = self.client.post(reverse('update_post', args=[self.post.pk]), {'title': 'Post', 'content': 'Edited'})
+        self.assertEqual(response.status_code, 302)
+        # What the view saves, from an instance loaded before a second vote.
+        stale = Post.objects.get(pk=self.post.pk)
+        votes.toggle_vote(self.post.pk, User.objects.create_user('other'), votes.LIKE)
+        stale.title = 'Renamed'
+        stale.save(update_fields=[*PostForm._meta.fields, 'revision', 'updated_at'])
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.title, post.content, post.like_count), ('Renamed', 'Edited', 2))
+
+    def test_deleting_a_voter_uncounts_their_votes(self):
+        reader = User.objects.create_user('reader')
+        votes.toggle_vote(self.post.pk, reader, votes.LIKE)
+        before = Post.objects.get(pk=self.post.pk)
+        reader.delete()
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.like_count, post.trending_score), (0, 0))
+        self.assertEqual(post.revision, before.revision + 1)
+        self.assertGreater(post.updated_at, before.updated_at)
+        self.assertEqual(stats.recompute_post_counters(), 0)
+
+    def test_recount_fixes_drifted_counters(self):
+        Post.objects.filter(pk=self.post.pk).update(like_count=5, comment_count=3, trending_score=4)
+        before = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(stats.recompute_post_counters(), 1)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.like_count, post.comment_count, post.trending_score), (0, 0, 0))
+        self.assertEqual(post.revision, before.revision + 1)
+        self.assertGreater(post.updated_at, before.updated_at)
+
+
+class VoteTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('writer')
+        self.post = Post.objects.create(author=self.author, title='Post', content='Body')
+        self.alice, self.bob = (User.objects.create_user(name) for name in ('alice', 'bob'))
+
+    def assertCounts(self, result, vote, likes, dislikes):
+        self.assertEqual((result.vote, result.like_count, result.dislike_count), (vote, likes, dislikes))
+        self.assertEqual(
+            Post.objects.filter(pk=self.post.pk).values_list('like_count', 'dislike_count').get(), (likes, dislikes))
+        self.assertEqual(AuthorStats.objects.get(user=self.author).total_likes, likes)
+        self.assertEqual(stats.recompute_post_counters(), 0)
+        self.assertEqual(stats.recompute(), 0)
+
+    def test_switching_and_unvoting(self):
+        self.assertCounts(votes.toggle_vote(self.post.pk, self.alice, votes.LIKE), votes.LIKE, 1, 0)
+        self.assertCounts(votes.toggle_vote(self.post.pk, self.bob, votes.LIKE), votes.LIKE, 2, 0)
+        self.assertCounts(votes.toggle_vote(self.post.pk, self.alice, votes.DISLIKE), votes.DISLIKE, 1, 1)
+        self.assertCounts(votes.toggle_vote(self.post.pk, self.alice, votes.LIKE), votes.LIKE, 2, 0)
+        self.assertCounts(votes.toggle_vote(self.post.pk, self.alice, votes.LIKE), None, 1, 0)
+        self.assertCounts(votes.toggle_vote(self.post.pk, self.bob, votes.DISLIKE), votes.DISLIKE, 0, 1)
+        self.assertCounts(votes.toggle_vote(self.post.pk, self.bob, votes.DISLIKE), None, 0, 0)
+        self.assertIsNone(votes.get_user_vote(self.post, self.bob))
+
+    def test_unknown_vote_type(self):
+        with self.assertRaises(ValueError):
+            votes.toggle_vote(self.post.pk, self.alice, 'love')
+
+
+class CommentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author, self.reader = (User.objects.create_user(name) for name in ('author', 'reader'))
+        self.post = Post.objects.create(author=self.author, title='Post', content='Body')
+
+    def test_comment_pages_walk_oldest_first(self):
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.reader, body=f'Comment {i}') for i in range(45)
+        )
+        url = reverse('post_comments', args=[self.post.pk])
+        bodies, sizes, cursor = [], [], ''
+        while cursor is not None:
+            page = self.client.get(url, {'format': 'json', 'cursor': cursor}).json()
+            sizes.append(len(page['comments']))
+            bodies += [comment['body'] for comment in page['comments']]
+            cursor = page['next_cursor']
+        self.assertEqual(sizes, [20, 20, 5])
+        self.assertEqual(bodies, [f'Comment {i}' for i in range(45)])
+        self.assertEqual(self.client.get(url, {'cursor': 'bogus'}).status_code, 400)
+
+    def test_comment_count_follows_creates_and_deletes(self):
+        url = reverse('post_detail', args=[self.post.pk])
+        self.client.force_login(self.reader)
+        self.assertNotContains(self.client.get(url), 'First!')
+        self.assertEqual(self.client.post(url, {'body': 'First!'}).status_code, 302)
+        self.assertContains(self.client.get(url), 'First!')
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comment_count, 1)
+        self.assertEqual(AuthorStats.objects.get(user=self.author).total_comments, 1)
+
+        Comment.objects.get().delete()
+        self.assertNotContains(self.client.get(url), 'First!')
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comment_count, 0)
+        self.assertEqual(AuthorStats.objects.get(user=self.author).total_comments, 0)
+
+    def test_comments_rescore_in_the_counter_update(self):
+        for delta, change in ((1, lambda: Comment.objects.create(post=self.post, author=self.reader, body='Hi')),
+                              (0, lambda: Comment.objects.get().delete())):
+            with QueryRecorder() as recorder:
+                change()
+            updates = [query for query in recorder.queries if query['sql'].lower().startswith('update "blogapp_post"')]
+            self.assertEqual(len(updates), 1)
+            post = Post.objects.get(pk=self.post.pk)
+            self.assertEqual(post.comment_count, delta)
+            self.assertAlmostEqual(post.trending_score, trending.score(0, 0, delta, post.created_at), places=4)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user('reader', password='pw')
+        self.post = Post.objects.create(author=User.objects.create_user('writer'), title='Post', content='Body')
+        self.url = reverse('post_detail', args=[self.post.pk])
+
+    def log_in(self, client):
+        token = client.get(reverse('login')).cookies['csrftoken'].value
+        response = client.post(reverse('login'), {'username': 'reader', 'password': 'pw', 'csrfmiddlewaretoken': token})
+        self.assertEqual(response.status_code, 302)
+
+    def test_unchanged_pages_are_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_edits_votes_and_logins_change_the_etag(self):
+        etags = [self.client.get(self.url)['ETag']]
+        post = Post.objects.get(pk=self.post.pk)
+        post.content = 'Edited'
+        post.save()
+        etags.append(self.client.get(self.url)['ETag'])
+        votes.toggle_vote(self.post.pk, User.objects.create_user('voter'), votes.LIKE)
+        etags.append(self.client.get(self.url)['ETag'])
+        self.client.force_login(self.reader)
+        etags.append(self.client.get(self.url)['ETag'])
+        self.assertEqual(len(set(etags)), 4)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etags[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Edited')
+
+    def test_feed_version_ignores_votes_but_not_edits(self):
+        url = reverse('site_feed')
+        etag = self.client.get(url)['ETag']
+        votes.toggle_vote(self.post.pk, self.reader, votes.LIKE)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        post = Post.objects.get(pk=self.post.pk)
+        post.content = 'Edited'
+        post.save()
+        self.assertContains(self.client.get(url, HTTP_IF_NONE_MATCH=etag), 'Edited')
+
+    def test_logging_in_again_changes_the_etag_of_pages_with_forms(self):
+        client = Client(enforce_csrf_checks=True)
+        self.log_in(client)
+        etag = client.get(self.url)['ETag']
+        client.get(reverse('logout'))
+        self.log_in(client)
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        # The token in the re-rendered form is accepted.
+        token = response.context['csrf_token']
+        response = client.post(self.url, {'body': 'Hello', 'csrfmiddlewaretoken': str(token)})
+        self.assertEqual(response.status_code, 302)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user('writer')
+        self.in_title = Post.objects.create(author=author, title='Sourdough starter', content='Flour and water.')
+        self.in_body = Post.objects.create(author=author, title='Weekend', content='Fed the sourdough starter.')
+        self.other = Post.objects.create(author=author, title='Cycling', content='A long ride.')
+
+    def ids(self, query):
+        return [hit.post.pk for hit in search.search_posts(query)]
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.ids('sourdough'), [self.in_title.pk, self.in_body.pk])
+
+    def test_last_word_matches_prefixes(self):
+        self.assertEqual(self.ids('sour'), [self.in_title.pk, self.in_body.pk])
+        self.assertEqual(self.ids('sourdough star'), [self.in_title.pk, self.in_body.pk])
+
+    def test_operators_and_quotes_are_plain_words(self):
+        for query in ('"sourdough', 'sourdough AND', 'NOT ride', 'title:cycling', 'ride*)(', '-- ; "'):
+            with self.subTest(query=query):
+                search.search_posts(query)
+        self.assertEqual(self.ids('"ride" OR'), [])
+        self.assertEqual(self.client.get(reverse('search_results'), {'q': '"(*'}).status_code, 200)
+
+    def test_index_follows_saves_and_deletes(self):
+        self.other.content = 'Sourdough on the road.'
+        self.other.save()
+        self.assertIn(self.other.pk, self.ids('sourdough'))
+        self.in_title.delete()
+        self.assertEqual(self.ids('flour'), [])
+        self.assertNotIn(self.in_title.pk, self.ids('sourdough'))
+
+    def test_saves_of_other_fields_skip_the_index(self):
+        with QueryRecorder() as recorder:
+            self.other.save(update_fields=['trending_score'])
+        self.assertFalse(any(search.SQLITE_TABLE in query['sql'] for query in recorder.queries))
+
+    def test_huge_pages_are_clamped(self):
+        results = search.search_posts('sourdough', page=10 ** 20)
+        self.assertEqual((results.page, list(results), results.has_next), (settings.BLOG_SEARCH_MAX_PAGE, [], False))
+        response = self.client.get(reverse('search_results'), {'q': 'sourdough', 'page': str(10 ** 20)})
+        self.assertEqual(response.status_code, 200)
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.author, self.reader = (User.objects.create_user(name) for name in ('author', 'reader'))
+        self.client.force_login(self.reader)
+
+    def toggle_follow(self, author):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('follow_user', args=[author.username]))
+
+    def publish(self, author, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(author=author, title=title, content='Body')
+
+    def entries(self):
+        return set(FeedEntry.objects.filter(owner=self.reader).values_list('post_id', flat=True))
+
+    def test_new_posts_are_fanned_out_to_followers(self):
+        self.toggle_follow(self.author)
+        post = self.publish(self.author, 'New')
+        self.assertEqual(self.entries(), {post.pk})
+        self.assertEqual([p.pk for p in feed.timeline_page(self.reader)], [post.pk])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        old = [self.publish(self.author, f'Old {i}').pk for i in range(3)]
+        with self.settings(BLOG_FEED_BACKFILL=2):
+            self.toggle_follow(self.author)
+        self.assertEqual(self.entries(), set(old[1:]))
+        self.toggle_follow(self.author)
+        self.assertEqual(self.entries(), set())
+
+    @override_settings(BLOG_FEED_FANOUT_LIMIT=1)
+    def test_popular_authors_are_merged_at_read_time(self):
+        star = User.objects.create_user('star')
+        self.toggle_follow(self.author)
+        self.toggle_follow(star)
+        follows.toggle_follow(User.objects.create_user('fan'), star)  # Now over the limit
+
+        first = self.publish(self.author, 'First')
+        second = self.publish(star, 'Second')
+        third = self.publish(self.author, 'Third')
+        self.assertEqual(self.entries(), {first.pk, third.pk})
+
+        page = feed.timeline_page(self.reader, per_page=2)
+        self.assertEqual([post.pk for post in page], [third.pk, second.pk])
+        rest = feed.timeline_page(self.reader, cursor=page.next_cursor, per_page=2)
+        self.assertEqual([post.pk for post in rest], [first.pk])
+        self.assertIsNone(rest.next_cursor)
+
+
+@tasks.task('tests.flaky', max_attempts=2)
+def flaky_task(fail):
+    if fail:
+        raise RuntimeError('flaky')
+
+
+@override_settings(BLOG_TASKS_EAGER=False, BLOG_TASKS_RETRY_DELAY=10)
+class TaskTests(TestCase):
+    def run_next(self):
+        task_row = tasks.claim('test-worker')
+        if task_row.payload.get('fail'):
+            with self.assertLogs('BlogApp.tasks', 'WARNING'):
+                ok = tasks.execute(task_row)
+        else:
+            ok = tasks.execute(task_row)
+        return ok, Task.objects.get(pk=task_row.pk)
+
+    def test_failures_are_retried_with_backoff(self):
+        tasks.enqueue('tests.flaky', {'fail': True}, idempotency_key='flaky')
+        ok, task_row = self.run_next()
+        self.assertFalse(ok)
+        self.assertEqual((task_row.status, task_row.attempts), (Task.QUEUED, 1))
+        self.assertAlmostEqual((task_row.run_at - timezone.now()).total_seconds(), 10, delta=2)
+        self.assertIsNone(tasks.claim('test-worker'))  # Not due yet
+
+        Task.objects.update(run_at=timezone.now())
+        ok, task_row = self.run_next()
+        self.assertEqual((task_row.status, task_row.attempts), (Task.FAILED, 2))
+        self.assertIn('RuntimeError', task_row.last_error)
+        self.assertIsNone(task_row.idempotency_key)
+
+    def test_idempotency_keys_are_held_until_the_task_finishes(self):
+        first = tasks.enqueue('tests.flaky', {'fail': False}, idempotency_key='once')
+        self.assertEqual(tasks.enqueue('tests.flaky', {'fail': False}, idempotency_key='once'), first)
+        self.assertEqual(self.run_next()[1].status, Task.DONE)
+        self.assertNotEqual(tasks.enqueue('tests.flaky', {'fail': False}, idempotency_key='once'), first)
+
+    def test_worker_requeues_stale_tasks(self):
+        task_row = tasks.enqueue('tests.flaky', {'fail': False})
+        long_ago = timezone.now() - timedelta(days=1)
+        Task.objects.filter(pk=task_row.pk).update(status=Task.RUNNING, locked_at=long_ago)
+        with self.assertLogs('BlogApp.tasks', 'WARNING') as logs:
+            self.assertEqual(tasks.work(threading.Event(), once=True), 1)
+        self.assertIn('Requeued 1 stale tasks', logs.output[0])
+        self.assertEqual(Task.objects.get(pk=task_row.pk).status, Task.DONE)
+
+    def test_stale_tasks_on_their_last_attempt_fail(self):
+        task_row = tasks.enqueue('tests.flaky', {'fail': False})
+        long_ago = timezone.now() - timedelta(days=1)
+        Task.objects.filter(pk=task_row.pk).update(status=Task.RUNNING, locked_at=long_ago, attempts=2)
+        self.assertEqual(tasks.requeue_stale(), 0)
+        self.assertEqual(Task.objects.get(pk=task_row.pk).status, Task.FAILED)
+
+    def test_a_run_requeued_as_stale_does_not_record_its_outcome(self):
+        tasks.enqueue('tests.flaky', {'fail': False})
+        first = tasks.claim('first-worker')
+        Task.objects.update(locked_at=timezone.now() - timedelta(days=1))
+        tasks.requeue_stale()
+        second = tasks.claim('second-worker')
+        with self.assertLogs('BlogApp.tasks', 'WARNING'):
+            tasks.execute(first)
+        self.assertEqual(Task.objects.get().status, Task.RUNNING)
+        tasks.execute(second)
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+
+    @override_settings(BLOG_TASKS_EAGER=True)
+    def test_eager_runs_use_the_queue(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = tasks.enqueue('tests.flaky', {'fail': False}, idempotency_key='eager')
+            self.assertEqual(tasks.enqueue('tests.flaky', {'fail': False}, idempotency_key='eager'), first)
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+
+        with self.assertLogs('BlogApp.tasks', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+            failing = tasks.enqueue('tests.flaky', {'fail': True})
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), (Task.QUEUED, 1))
+
+    def test_purge_removes_old_done_and_failed_tasks(self):
+        long_ago = timezone.now() - timedelta(days=30)
+        for status in (Task.DONE, Task.FAILED, Task.QUEUED):
+            Task.objects.create(name='tests.flaky', status=status, finished_at=long_ago)
+        Task.objects.create(name='tests.flaky', status=Task.DONE, finished_at=timezone.now())
+        self.assertEqual(tasks.purge_finished(), 2)
+        self.assertEqual(Task.objects.count(), 2)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        alice, bob = (User.objects.create_user(name) for name in ('alice', 'bob'))
+        for i in range(5):
+            Post.objects.create(author=alice if i % 2 else bob, title=f'Post {i}',
+                                content=f'Line one of {i}.\n\n---\nkey: not front matter')
+
+    def posts(self):
+        return sorted(Post.objects.values_list('author__username', 'title', 'created_at', 'content'))
+
+    def run_command(self, *args):
+        call_command(*args, '--workers', '1', stdout=StringIO(), stderr=StringIO())
+
+    def test_round_trip(self):
+        for path in (f'{self.dir}/posts.jsonl', f'{self.dir}/markdown'):
+            with self.subTest(path=path):
+                before = self.posts()
+                self.run_command('export_posts', path)
+                Post.objects.all().delete()
+                self.run_command('import_posts', path)
+                self.assertEqual(self.posts(), before)
+                self.assertEqual(stats.recompute(), 0)
+
+    def test_interrupted_import_resumes(self):
+        path = f'{self.dir}/posts.jsonl'
+        self.run_command('export_posts', path)
+        before = self.posts()
+        Post.objects.all().delete()
+        with open(path) as f:
+            lines = f.readlines()
+        undated = '{"author": "alice", "title": "Undated", "content": "No date."}\n'
+        broken = '{"author": "alice", "title": "Broken", "content": "x", "created_at": 5}\n'
+        with open(path, 'w') as f:
+            f.writelines([undated, *lines[:2], broken, *lines[2:]])
+        with self.assertRaisesMessage(CommandError, 'bad created_at 5'):
+            call_command('import_posts', path, '--workers', '1', '--batch-size', '2',
+                         stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(Post.objects.count(), 2)
+
+        with open(path, 'w') as f:
+            f.writelines([undated, *lines])
+        out = StringIO()
+        call_command('import_posts', path, '--workers', '1', '--batch-size', '2', stdout=out, stderr=StringIO())
+        self.assertIn('Resuming after record 2', out.getvalue())
+        self.assertIn('Imported 4 posts', out.getvalue())
+        self.assertEqual(Post.objects.filter(title='Undated').count(), 1)
+        self.assertEqual([post for post in self.posts() if post[1] != 'Undated'], before)
+        self.assertFalse(Post.objects.exclude(edited_at=F('created_at')).exclude(title='Undated').exists())
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+
+class SeedTests(TestCase):
+    def test_clear_only_deletes_generated_users(self):
+        User.objects.create_user('seedling')
+        options = dict(users=5, posts=5, comments=5, votes=5, follows=1, stdout=StringIO())
+        call_command('seed_blog', **options)
+        call_command('seed_blog', clear=True, **options)
+        self.assertEqual(User.objects.filter(username__startswith='seed').count(), 6)
+        self.assertTrue(User.objects.filter(username='seedling').exists())
+        self.assertEqual(stats.recompute(), 0)
+
+    def test_numbering_continues_after_gaps(self):
+        options = dict(users=3, posts=3, comments=3, votes=3, follows=1, stdout=StringIO())
+        call_command('seed_blog', **options)
+        User.objects.get(username='seed0').delete()
+        call_command('seed_blog', **options)
+        self.assertEqual(
+            sorted(User.objects.filter(username__startswith='seed').values_list('username', flat=True)),
+            ['seed1', 'seed2', 'seed3', 'seed4', 'seed5'],
+        )
+
+
+class BenchTests(TestCase):
+    def test_user_without_posts_is_an_error(self):
+        author = User.objects.create_user('writer')
+        Post.objects.create(author=author, title='Post', content='Body')
+        User.objects.create_user('reader')
+        with self.assertRaisesMessage(CommandError, 'no posts'):
+            call_command('bench_blog', user='reader', stdout=StringIO())
+
+    def test_lone_user_is_an_error(self):
+        author = User.objects.create_user('writer')
+        Post.objects.create(author=author, title='Post', content='Body')
+        with self.assertRaisesMessage(CommandError, 'No other user'):
+            call_command('bench_blog', user='writer', stdout=StringIO())
+
+
+class GroupCacheTests(TestCase):
+    def setUp(self):
+        self.writers = Group.objects.get_or_create(name='Writers')[0]
+        self.user = User.objects.create_user('someone', password='pw')
+        self.user.groups.add(self.writers)
+        self.client.force_login(self.user)
+
+    def test_membership_is_cached_in_the_session(self):
+        with QueryRecorder() as recorder:
+            self.assertEqual(self.client.get(reverse('create_post')).status_code, 200)
+        self.assertFalse(any('auth_group' in query['sql'] for query in recorder.queries))
+
+    def test_group_changes_invalidate_the_cache(self):
+        self.user.groups.remove(self.writers)
+        self.assertRedirects(self.client.get(reverse('create_post')), reverse('post_list'))
+        self.writers.user_set.add(self.user)
+        self.assertEqual(self.client.get(reverse('create_post')).status_code, 200)
+        self.writers.delete()
+        self.assertRedirects(self.client.get(reverse('create_post')), reverse('post_list'))
+
+
+class UsernameFilterTests(TestCase):
+    def setUp(self):
+        saved = (usernames._filter, usernames._built_at, usernames._build)
+
+        def restore():
+            usernames._filter, usernames._built_at, usernames._build = saved
+        self.addCleanup(restore)
+
+    def test_stale_filter_answers_while_one_thread_rebuilds_it(self):
+        stale = usernames.BloomFilter(10)
+        stale.add('alice')
+        usernames._filter = stale
+        usernames._built_at = time.monotonic() - settings.BLOG_USERNAME_FILTER_REFRESH - 1
+        release = threading.Event()
+        builds = []
+
+        def slow_build():
+            builds.append(threading.current_thread())
+            release.wait(5)
+            bloom = usernames.BloomFilter(10)
+            bloom.add('bob')
+            return bloom
+        usernames._build = slow_build
+
+        self.assertIs(usernames.get_filter(), stale)
+        self.assertIs(usernames.get_filter(), stale)
+        usernames.remember('Carol')
+        release.set()
+        with usernames._build_lock:  # released when the rebuild finishes
+            rebuilt = usernames.get_filter()
+        self.assertEqual(len(builds), 1)
+        self.assertIsNot(builds[0], threading.current_thread())
+        self.assertIn('bob', rebuilt)
+        self.assertIn('carol', rebuilt)
+
+
+class ProfileProvisioningTests(TestCase):
+    def test_saving_a_user_leaves_the_profile_alone(self):
+        user = User.objects.create_user('someone', password='pw')
+        self.assertTrue(Profile.objects.filter(user=user).exists())
+        with QueryRecorder() as recorder:
+            user.save()
+        self.assertFalse(any('blogapp_profile' in query['sql'].lower() for query in recorder.queries))
+
+    def test_backfill_creates_missing_rows(self):
+        users = User.objects.bulk_create([User(username='bulk1'), User(username='bulk2')])
+        call_command('backfill_profiles', stdout=StringIO())
+        self.assertEqual(Profile.objects.filter(user__in=users).count(), 2)
+        self.assertEqual(AuthorStats.objects.filter(user__in=users).count(), 2)
+
+
+    def test_profile_pages_never_create_profiles(self):
+        User.objects.bulk_create([User(username='noprofile')])
+        self.assertEqual(self.client.get(reverse('public_profile', args=['noprofile'])).status_code, 404)
+        self.assertFalse(Profile.objects.filter(user__username='noprofile').exists())
+
+    def test_profile_posts_are_paginated(self):
+        author = User.objects.create_user('author')
+        Post.objects.bulk_create(Post(author=author, title=f'Post {i:02}', content='Body') for i in range(15))
+        url = reverse('public_profile', args=['author'])
+        response = self.client.get(url)
+        self.assertEqual(len(response.context['posts']), 10)
+        cursor = response.context['posts'].next_cursor
+        rest = self.client.get(url, {'partial': 1, 'cursor': cursor})
+        self.assertEqual(rest['X-Next-Cursor'], '')
+        self.assertContains(rest, 'Post 00')
+        self.assertNotContains(rest, 'Post 14')
+        self.assertEqual(self.client.get(url, {'cursor': 'bogus'}).status_code, 400)
+
+class FollowTests(TestCase):
+    def test_toggle_keeps_counts_exact(self):
+        alice, bob = (User.objects.create_user(name) for name in ('alice', 'bob'))
+        self.assertTrue(follows.toggle_follow(alice, bob))
+        self.assertEqual(AuthorStats.objects.get(user=bob).follower_count, 1)
+        self.assertEqual(AuthorStats.objects.get(user=alice).following_count, 1)
+        self.assertFalse(follows.toggle_follow(alice, bob))
+        self.assertEqual(AuthorStats.objects.get(user=bob).follower_count, 0)
+        self.assertEqual(stats.recompute(), 0)
+
+    def test_deleting_a_user_uncounts_their_likes_and_follows(self):
+        author, reader, fan = (User.objects.create_user(name) for name in ('author', 'reader', 'fan'))
+        post = Post.objects.create(author=author, title='Post', content='Body')
+        votes.toggle_vote(post.pk, reader, votes.LIKE)
+        reader.profile.following.add(author.profile)
+        fan.profile.following.add(reader.profile)
+        reader.delete()
+        self.assertEqual(
+            AuthorStats.objects.filter(user=author).values_list('total_likes', 'follower_count').get(), (0, 0))
+        self.assertEqual(AuthorStats.objects.get(user=fan).following_count, 0)
+        self.assertEqual(stats.recompute(), 0)
+
+    def test_deleted_profiles_leave_follow_counts_exact(self):
+        alice, bob, carol = (User.objects.create_user(name) for name in ('alice', 'bob', 'carol'))
+        alice.profile.following.add(bob.profile, carol.profile)
+        bob.profile.following.add(alice.profile)
+        Profile.objects.filter(user=alice).delete()
+        self.assertEqual(stats.recompute(), 0)
+        self.assertEqual(AuthorStats.objects.get(user=bob).following_count, 0)
+
+    def test_suggestions(self):
+        # 1 follows 2 and 3, who both follow 4. 3 and 5 follow 1 and also follow 4 and 6.
+        edges = [(1, 2), (1, 3), (2, 4), (3, 4), (3, 1), (5, 1), (5, 6)]
+        graph = follows.FollowGraph((array('q', [a for a, _ in edges]), array('q', [b for _, b in edges])), 7)
+        self.assertEqual(graph.suggest(1, 10), [(4, 3), (6, 1)])
+        self.assertEqual(graph.suggest(6, 10), [(1, 1)])
+        self.assertEqual(graph.suggest(99, 10), [])
+
+
+class QueryRecorderTests(TestCase):
+    def test_normalize_collapses_values(self):
+        self.assertEqual(
+            normalize("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x'  LIMIT 21"),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?',
+        )
+
+    def test_repeated_shapes_are_reported(self):
+        users = [User.objects.create_user(f'user{i}') for i in range(3)]
+        with QueryRecorder() as recorder:
+            for user in users:
+                User.objects.get(pk=user.pk)
+        self.assertEqual(recorder.count, 3)
+        self.assertEqual(list(recorder.repeated_shapes().values()), [3])
+
+
+class MediaStorageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = self.settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.author = User.objects.create_user('writer')
+
+    def post_with_cover(self, data, name='cover.png'):
+        return Post.objects.create(
+            author=self.author, title='Post', content='Body', cover_image=SimpleUploadedFile(name, data),
+        )
+
+    def test_identical_uploads_share_one_counted_file(self):
+        first = self.post_with_cover(b'same bytes', 'Screenshot_14.png')
+        second = self.post_with_cover(b'same bytes', 'Screenshot_14.PNG')
+        self.assertEqual(first.cover_image.name, second.cover_image.name)
+        self.assertEqual(MediaBlob.objects.get().ref_count, 2)
+
+    def test_replaced_files_are_collected(self):
+        old = self.post_with_cover(b'old').cover_image.name
+        post = Post.objects.get(title='Post')
+        post.cover_image = SimpleUploadedFile('new.png', b'new')
+        post.save()
+        self.assertEqual(MediaBlob.objects.get(name=old).ref_count, 0)
+
+        storage = media_storage()
+        self.assertEqual(media.collect_garbage(storage, timedelta(0)), (1, 3))
+        self.assertFalse(storage.exists(old))
+        self.assertTrue(storage.exists(post.cover_image.name))
+        self.assertEqual(media.recount_refs(), 0)
+
+    def test_collection_keeps_a_blob_uploaded_again_meanwhile(self):
+        name = self.post_with_cover(b'again').cover_image.name
+        Post.objects.all().delete()
+
+        def upload_again(sender, **kwargs):
+            post_delete.disconnect(upload_again, sender=MediaBlob)
+            self.post_with_cover(b'again')
+        post_delete.connect(upload_again, sender=MediaBlob)
+        self.addCleanup(post_delete.disconnect, upload_again, sender=MediaBlob)
+
+        storage = media_storage()
+        self.assertEqual(media.collect_garbage(storage, timedelta(0)), (1, 5))
+        with storage.open(name) as f:
+            self.assertEqual(f.read(), b'again')
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 1)
+
+    def test_internal_files_are_not_served(self):
+        name = self.post_with_cover(b'secret').cover_image.name
+        storage = media_storage()
+        for internal in ('tmp/upload123', name + '.deleting'):
+            with self.subTest(name=internal):
+                os.makedirs(os.path.dirname(storage.path(internal)), exist_ok=True)
+                with open(storage.path(internal), 'wb') as f:
+                    f.write(b'secret')
+                self.assertEqual(self.client.get(f'/media/{internal}').status_code, 404)
+
+    def test_blobs_are_served_with_ranges_and_forever_caching(self):
+        url = self.post_with_cover(b'0123456789').cover_image.url
+        response = self.client.get(url)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Cache-Control'], 'max-age=315360000, public, immutable')
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': response['ETag']}).status_code, 304)
+        partial = self.client.get(url, headers={'Range': 'bytes=2-4'})
+        self.assertEqual((partial.status_code, b''.join(partial.streaming_content)), (206, b'234'))
+
+        with self.settings(BLOG_MEDIA_ACCEL_REDIRECT='/internal-media/'):
+            offloaded = self.client.get(url)
+        self.assertEqual(offloaded['X-Accel-Redirect'], url.replace('/media/', '/internal-media/'))
+        self.assertEqual(offloaded.content, b'')
+
+    def png(self, color):
+        buffer = BytesIO()
+        Image.new('RGBA', (400, 200), color).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def test_transparent_images_keep_alpha_in_webp_and_turn_white_in_jpeg(self):
+        post = self.post_with_cover(self.png((255, 0, 0, 0)))
+        variants = images.generate_variants(post.cover_image, (320,))
+        storage = media_storage()
+        with storage.open(variants['webp']['320']) as f:
+            self.assertEqual(Image.open(f).convert('RGBA').getpixel((0, 0))[3], 0)
+        with storage.open(variants['jpeg']['320']) as f:
+            self.assertGreater(min(Image.open(f).getpixel((0, 0))), 250)
+
+    def test_force_rewrites_up_to_date_variants(self):
+        post = self.post_with_cover(self.png((0, 0, 255, 255)))
+        name = images.generate_variants(post.cover_image, (320,))['jpeg']['320']
+        storage = media_storage()
+        with storage.open(name, 'wb') as f:
+            f.write(b'stale')
+        images.generate_variants(post.cover_image, (320,))
+        with storage.open(name) as f:
+            self.assertEqual(f.read(), b'stale')
+        images.generate_variants(post.cover_image, (320,), force=True)
+        with storage.open(name) as f:
+            self.assertEqual(Image.open(f).format, 'JPEG')
+
+    async def test_async_requests_stream_media(self):
+        post = await sync_to_async(self.post_with_cover)(b'0123456789')
+        response = await self.async_client.get(post.cover_image.url, headers={'Range': 'bytes=-3'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), b'789')
@@ -0,0 +1,88 @@
+"""
+Trending posts.
+
+Each post stores a trending score, with a gravity formula like Hacker News::
+
+    (likes - dislikes + BLOG_TRENDING_COMMENT_WEIGHT * comments)
+        / (age in hours + 2) ** BLOG_TRENDING_GRAVITY
+
+Post.trending_score is indexed together with id, so the trending page is a
+walk down that index with no aggregation at read time. Votes and comments
+rescore their post straight away (signals.py). Ages only grow, though, so
+`manage.py decay_trending` must run periodically, e.g. every 10 minutes
+from cron, to rescore recent posts in batches. Posts older than
+BLOG_TRENDING_MAX_AGE_DAYS score 0.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Post
+
+SCORE_FIELDS = ('like_count', 'dislike_count', 'comment_count', 'created_at')
+
+# ?window= values of the trending page, in days.
+WINDOWS = {'day': 1, 'week': 7, 'month': 30}
+
+
+def score(like_count, dislike_count, comment_count, created_at, now=None):
+    now = now or timezone.now()
+    age_hours = max(0.0, (now - created_at).total_seconds() / 3600)
+    if age_hours > settings.BLOG_TRENDING_MAX_AGE_DAYS * 24:
+        return 0.0
+    points = like_count - dislike_count + settings.BLOG_TRENDING_COMMENT_WEIGHT * comment_count
+    return points / (age_hours + 2) ** settings.BLOG_TRENDING_GRAVITY
+
+
+def update_score(post_id, counters=None):
+    """Rescore one post from its current SCORE_FIELDS (read unless given as a dict)."""
+    if counters is None:
+        counters = Post.objects.filter(pk=post_id).values(*SCORE_FIELDS).first()
+        if counters is None:
+            return
+    Post.objects.filter(pk=post_id).update(trending_score=score(**counters))
+
+
+def rescore(post_ids):
+    """Rescore the given posts from their current SCORE_FIELDS in one bulk update."""
+    now = timezone.now()
+    posts = [
+        Post(pk=pk, trending_score=score(*counters, now=now))
+        for pk, *counters in Post.objects.filter(pk__in=post_ids).values_list('pk', *SCORE_FIELDS)
+    ]
+    Post.objects.bulk_update(posts, ['trending_score'])
+
+
+def decay(batch_size=1000):
+    """
+    Rescore every post young enough to trend, in batches, and zero the
+    scores of posts that have aged out. Returns the number of posts rescored.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(days=settings.BLOG_TRENDING_MAX_AGE_DAYS)
+    rows = (
+        Post.objects.filter(created_at__gte=cutoff).order_by('pk')
+        .values_list('pk', *SCORE_FIELDS).iterator(chunk_size=batch_size)
+    )
+    total = 0
+    batch = []
+    for pk, *counters in rows:
+        batch.append(Post(pk=pk, trending_score=score(*counters, now=now)))
+        if len(batch) >= batch_size:
+            Post.objects.bulk_update(batch, ['trending_score'])
+            total += len(batch)
+            batch = []
+    if batch:
+        Post.objects.bulk_update(batch, ['trending_score'])
+        total += len(batch)
+    Post.objects.filter(created_at__lt=cutoff).exclude(trending_score=0).update(trending_score=0)
+    return total
+
+
+def trending_posts(window=None):
+    """Posts for listing, best trending score first; ``window`` is a key of WINDOWS."""
+    posts = Post.objects.for_listing().order_by('-trending_score', '-id')
+    if window is not None:
+        posts = posts.filter(created_at__gte=timezone.now() - timedelta(days=WINDOWS[window]))
+    return posts
@@ -4,11 +4,15 @@ from django.contrib.auth import views as auth_views
 
 urlpatterns = [
     path('', views.PostListView.as_view(), name='post_list'),
+    path('following/', views.TimelineView.as_view(), name='timeline'),
+    path('trending/', views.TrendingView.as_view(), name='trending'),
 
 
     path('my-posts/', views.MyPostsView.as_view(), name='my_posts'),
     path('post/<int:pk>/', views.PostDetailView.as_view(), name='post_detail'),
     path('search/', views.SearchView.as_view(), name='search_results'),
+    path('feed/', views.FeedView.as_view(), name='site_feed'),
+    path('feed/rss/', views.FeedView.as_view(feed_type='rss'), name='site_feed_rss'),
     path('accounts/login/', auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
     path('accounts/logout/', views.custom_logout_view, name='logout'), 
     path('post/new/', views.PostCreateView.as_view(), name='create_post'),
@@ -18,6 +22,9 @@ urlpatterns = [
     path('post/<int:pk>/delete/', views.PostDeleteView.as_view(), name='delete_post'),
     path('user/<str:username>/', views.PublicProfileView.as_view(), name='public_profile'),
     path('user/<str:username>/follow/', views.FollowView.as_view(), name='follow_user'),
+    path('user/<str:username>/feed/', views.FeedView.as_view(), name='author_feed'),
+    path('user/<str:username>/feed/rss/', views.FeedView.as_view(feed_type='rss'), name='author_feed_rss'),
     path('register/', views.RegisterView.as_view(), name='register'),
     path('post/<int:pk>/vote/', views.PostVoteView.as_view(), name='post_vote'),
+    path('post/<int:pk>/comments/', views.PostCommentsView.as_view(), name='post_comments'),
 ]
\ No newline at end of file
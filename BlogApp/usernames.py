@@ -0,0 +1,186 @@
+"""
+Username availability checks for the registration form.
+
+A check goes through three layers, cheapest first:
+
+1. A per-process Bloom filter of lower-cased usernames. A miss means the
+   name is definitely not taken, so neither the cache nor the database is
+   touched.
+2. A short-lived cache of recent answers for names that might be taken.
+3. An indexed LOWER(username) lookup (see migration 0014).
+
+The filter is rebuilt every BLOG_USERNAME_FILTER_REFRESH seconds, by one
+background thread while requests keep using the old one, and learns new
+names from the User post_save signal. A name registered through another
+worker process may therefore show as available for a short time; the
+registration form still enforces uniqueness when it is submitted.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections
+from django.db.models.functions import Lower
+
+FALSE_POSITIVE_RATE = 0.01
+MIN_CAPACITY = 10000
+
+
+class BloomFilter:
+    """
+    Fixed-size set membership test with no false negatives and a tunable
+    false positive rate, backed by a bytearray.
+    """
+    def __init__(self, capacity, error_rate=FALSE_POSITIVE_RATE):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(math.ceil(self.size / 8))
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing: k positions from two 64-bit halves of one digest.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+_lock = threading.Lock()
+# Held for the duration of a rebuild, so one thread per process scans auth_user.
+_build_lock = threading.Lock()
+_filter = None
+_built_at = 0.0
+# Names remembered while a rebuild is running, added to the new filter.
+_pending = None
+
+logger = logging.getLogger(__name__)
+
+
+def _build():
+    total = User.objects.count()
+    bloom = BloomFilter(max(MIN_CAPACITY, total * 2))
+    for username in User.objects.values_list('username', flat=True).iterator(chunk_size=5000):
+        bloom.add(username.lower())
+    return bloom
+
+
+def _rebuild():
+    global _filter, _built_at, _pending
+    with _lock:
+        _pending = []
+    try:
+        bloom = _build()
+    except BaseException:
+        with _lock:
+            _pending = None
+        raise
+    with _lock:
+        for name in _pending:
+            bloom.add(name)
+        _filter, _built_at, _pending = bloom, time.monotonic(), None
+    return bloom
+
+
+def warm():
+    """Build (or rebuild) this process's filter."""
+    with _build_lock:
+        return _rebuild()
+
+
+def _rebuild_in_background():
+    try:
+        _rebuild()
+    except Exception:
+        logger.exception('Rebuilding the username filter failed')
+    finally:
+        _build_lock.release()
+        connections.close_all()
+
+
+def _is_fresh(bloom):
+    return (
+        bloom is not None
+        and time.monotonic() - _built_at <= settings.BLOG_USERNAME_FILTER_REFRESH
+        and bloom.count <= bloom.capacity
+    )
+
+
+def get_filter():
+    """
+    This process's filter. The first call builds it; callers arriving
+    meanwhile wait for that build. Later, a stale filter keeps answering
+    while one background thread rebuilds it.
+    """
+    bloom = _filter
+    if _is_fresh(bloom):
+        return bloom
+    if bloom is None:
+        with _build_lock:
+            bloom = _filter
+            return bloom if _is_fresh(bloom) else _rebuild()
+    if _build_lock.acquire(blocking=False):
+        threading.Thread(target=_rebuild_in_background, daemon=True).start()
+    return bloom
+
+
+def remember(username):
+    """Record a new or renamed username in this process's filter and drop cached answers."""
+    with _lock:
+        if _filter is not None:
+            _filter.add(username.lower())
+        if _pending is not None:
+            _pending.append(username.lower())
+    cache.delete(_cache_key(username.lower()))
+
+
+def _cache_key(name):
+    return 'username-taken:' + hashlib.md5(name.encode()).hexdigest()
+
+
+def _taken(name):
+    return User.objects.annotate(username_lower=Lower('username')).filter(username_lower=name)
+
+
+def is_username_available(username):
+    name = username.lower()
+    if name not in get_filter():
+        return True
+
+    key = _cache_key(name)
+    available = cache.get(key)
+    if available is None:
+        available = not _taken(name).exists()
+        cache.set(key, available, settings.BLOG_USERNAME_CACHE_TTL)
+    return available
+
+
+async def ais_username_available(username):
+    """Async version of is_username_available(); filter misses never leave the event loop."""
+    name = username.lower()
+    bloom = _filter
+    if not _is_fresh(bloom):
+        bloom = await sync_to_async(get_filter)()
+    if name not in bloom:
+        return True
+
+    key = _cache_key(name)
+    available = await cache.aget(key)
+    if available is None:
+        available = not await _taken(name).aexists()
+        await cache.aset(key, available, settings.BLOG_USERNAME_CACHE_TTL)
+    return available
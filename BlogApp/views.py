@@ -1,69 +1,228 @@
 # BlogApp/views.py
-from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required, user_passes_test
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.views.generic import View
-from django.urls import reverse_lazy
+from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
 from django.contrib.auth import login,logout
 from django.contrib.auth.models import Group,User
 from .forms import WriterRegistrationForm
 from .forms import UserUpdateForm, ProfileUpdateForm # <-- ADD THIS
 from django.contrib import messages # <-- ADD THIS
-from .models import Post, Comment
+from .models import Post, Comment, FollowSuggestion
 from .forms import PostForm, CommentForm
-from django.http import JsonResponse
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
 # ... (existing imports) ...
-from django.db.models import Count, Sum
 from .models import Post
 from .models import Profile # <-- Make sure this is imported
-from django.db.models import Q
+from django.db import transaction
+from django.utils.cache import patch_vary_headers
+from .conditional import conditional_response
+from .identity import writer_required
+from .pagination import InvalidCursor, KeysetPage, apaginate_keyset, paginate_keyset
+from . import feed, follows, search, stats, syndication, trending, usernames, votes
 # --- Helper Function for Decorators ---
 
-def is_writer(user):
-    """Checks if the user is in the 'Writers' group"""
-    if not user.is_authenticated:
-        return False
-    return user.groups.filter(name='Writers').exists()
-
-# Decorators for the Writer Panel
-writer_required = user_passes_test(is_writer, login_url=reverse_lazy('post_list'))
+# Decorators for the Writer Panel (group membership is cached per session, see identity.py)
 login_and_writer_required = [login_required, writer_required]
 
 
+async def get_user_async(request):
+    """
+    Load the logged-in user from an async view. It is also stored as
+    request.user, so templates rendered afterwards don't look it up again.
+    """
+    user = await request.auser()
+    request.user = user
+    return user
+
+
+def wants_json(request):
+    """True for fetch()/XMLHttpRequest callers asking for a JSON response."""
+    return (
+        'application/json' in request.headers.get('Accept', '')
+        or request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+    )
+
+
 # --- Reader Panel Views (Public) ---
 
 class PostListView(View):
     """
     Reader Panel: View all published posts in a single list.
+    Pages are cursor-based: ?cursor=<token> continues after the last post shown.
+    ?partial=1 (or an XMLHttpRequest) returns just the post cards for "load more",
+    ?format=json returns the page as JSON.
+    """
+    paginate_by = 10
+
+    async def get(self, request, *args, **kwargs):
+        await get_user_async(request)
+        try:
+            page = await apaginate_keyset(
+                Post.objects.for_listing(),
+                cursor=request.GET.get('cursor'),
+                per_page=self.paginate_by,
+            )
+        except InvalidCursor:
+            return HttpResponseBadRequest('Invalid cursor')
+
+        # The page's rows identify it; "load more" and JSON are separate variants.
+        variant = (request.GET.get('format'), bool(request.GET.get('partial')),
+                   request.headers.get('X-Requested-With'))
+        parts = ('posts', variant, [(post.pk, post.updated_at) for post in page], page.next_cursor)
+        last_modified = max((post.updated_at for post in page), default=None)
+
+        # Templates may still touch lazy relations, so they render in a thread.
+        response = await conditional_response(
+            request, parts, last_modified,
+            lambda: sync_to_async(post_page_response)(request, page, 'BlogApp/post_list.html'),
+        )
+        patch_vary_headers(response, ('X-Requested-With',))
+        return response
+
+
+class TrendingView(View):
+    """
+    Reader Panel: The top posts by trending score (votes and comments,
+    decayed by age). ?window=day|week|month only ranks posts from that
+    period ("Top this week"). Also supports ?partial=1 and ?format=json.
+    """
+    paginate_by = 20
+
+    async def get(self, request, *args, **kwargs):
+        await get_user_async(request)
+        window = request.GET.get('window') or None
+        if window is not None and window not in trending.WINDOWS:
+            return HttpResponseBadRequest('Unknown window')
+        posts = trending.trending_posts(window)[:self.paginate_by]
+        page = KeysetPage([post async for post in posts], None)
+
+        variant = (request.GET.get('format'), bool(request.GET.get('partial')),
+                   request.headers.get('X-Requested-With'))
+        parts = ('trending', window, variant, [(post.pk, post.updated_at) for post in page])
+        last_modified = max((post.updated_at for post in page), default=None)
+        response = await conditional_response(
+            request, parts, last_modified,
+            lambda: sync_to_async(post_page_response)(request, page, 'BlogApp/trending.html'),
+        )
+        patch_vary_headers(response, ('X-Requested-With',))
+        return response
+
+
+def post_page_response(request, page, template_name):
+    """
+    Render a KeysetPage of posts as a full page, a "load more" fragment
+    (?partial=1 or XMLHttpRequest) or JSON (?format=json).
+    """
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'posts': [post_to_json(post) for post in page],
+            'next_cursor': page.next_cursor,
+        })
+
+    context = {
+        'posts': page,
+        'next_cursor': page.next_cursor,
+    }
+    if request.GET.get('partial') or request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        response = render(request, 'BlogApp/partials/post_cards.html', context)
+        response['X-Next-Cursor'] = page.next_cursor or ''
+        return response
+    return render(request, template_name, context)
+
+
+def post_to_json(post):
+    """Serialize a post from Post.objects.for_listing() for the JSON feed."""
+    return {
+        'id': post.pk,
+        'title': post.title,
+        'url': reverse('post_detail', args=[post.pk]),
+        'author': post.author.username,
+        'author_url': reverse('public_profile', args=[post.author.username]),
+        'created_at': post.created_at.isoformat(),
+        'excerpt': post.excerpt,
+        'cover_image': post.cover_image.url if post.cover_image else None,
+    }
+
+
+@method_decorator(login_required, name='dispatch')
+class TimelineView(View):
+    """
+    Reader Panel: Posts from the authors the logged-in user follows.
+    Paged the same way as PostListView (?cursor=, ?partial=1, ?format=json).
     """
+    paginate_by = 10
+
     def get(self, request, *args, **kwargs):
-        # This gets all posts
-        all_posts = Post.objects.all().order_by('-created_at')
-        
-        # This passes them to the template as a variable named 'posts'
-        context = {
-            'posts': all_posts
-        }
-        return render(request, 'BlogApp/post_list.html', context)
+        try:
+            page = feed.timeline_page(request.user, cursor=request.GET.get('cursor'),
+                                      per_page=self.paginate_by)
+        except InvalidCursor:
+            return HttpResponseBadRequest('Invalid cursor')
+
+        return post_page_response(request, page, 'BlogApp/timeline.html')
+
+def comment_page(post_id, cursor=None, per_page=20):
+    """
+    A KeysetPage of a post's comments, oldest first, with the author's
+    username loaded in the same query.
+    """
+    return paginate_keyset(
+        Comment.objects.filter(post_id=post_id)
+        .select_related('author')
+        .only('body', 'created_at', 'author__username'),
+        cursor=cursor, per_page=per_page, descending=False,
+    )
+
+
+def comment_to_json(comment):
+    return {
+        'id': comment.pk,
+        'body': comment.body,
+        'author': comment.author.username,
+        'author_url': reverse('public_profile', args=[comment.author.username]),
+        'created_at': comment.created_at.isoformat(),
+    }
+
 
 class PostDetailView(View):
     """
-    Reader Panel: View a single post and its comments.
+    Reader Panel: View a single post and the first page of its comments.
     Handles GET (viewing) and POST (commenting).
+    Later comment pages are loaded from PostCommentsView.
     """
-    def get(self, request, pk, *args, **kwargs):
-        post = get_object_or_404(Post, pk=pk)
-        comments = post.comments.all()
+    async def get(self, request, pk, *args, **kwargs):
+        user = await get_user_async(request)
+        post = await aget_object_or_404(Post.objects.select_related('author').defer('content'), pk=pk)
+        user_vote = await votes.aget_user_vote(pk, user)
+        # Only evaluated when the cached comment fragment is missing
+        comments = SimpleLazyObject(lambda: comment_page(post.pk))
         comment_form = CommentForm()
         
         context = {
             'post': post,
             'comments': comments,
-            'comment_form': comment_form
+            'comment_form': comment_form,
+            'user_vote': user_vote,
+            'fragment_cache_timeout': settings.BLOG_FRAGMENT_CACHE_TIMEOUT,
         }
-        return render(request, 'BlogApp/post_detail.html', context)
+        # Edits, votes and comments all bump the revision and updated_at.
+        return await conditional_response(
+            request, ('post', post.pk, post.revision, post.updated_at, user_vote), post.updated_at,
+            lambda: sync_to_async(render)(request, 'BlogApp/post_detail.html', context),
+            csrf=True,
+        )
 
-    def post(self, request, pk, *args, **kwargs):
+    async def post(self, request, pk, *args, **kwargs):
+        # A View's handlers must be all sync or all async.
+        return await sync_to_async(self.add_comment)(request, pk)
+
+    def add_comment(self, request, pk):
         """
         This method handles the POST request for adding a comment.
         """
@@ -81,14 +240,39 @@ class PostDetailView(View):
             return redirect('post_detail', pk=post.pk)
         else:
             # If form is invalid, re-render the page with the errors
-            comments = post.comments.all()
+            comments = SimpleLazyObject(lambda: comment_page(post.pk))
             context = {
                 'post': post,
                 'comments': comments,
-                'comment_form': comment_form # Pass the invalid form back
+                'comment_form': comment_form, # Pass the invalid form back
+                'user_vote': votes.get_user_vote(post, request.user),
+                'fragment_cache_timeout': settings.BLOG_FRAGMENT_CACHE_TIMEOUT,
             }
             return render(request, 'BlogApp/post_detail.html', context)
 
+class PostCommentsView(View):
+    """
+    Reader Panel: Later pages of a post's comments for "load more".
+    Returns the comment markup with the next cursor in X-Next-Cursor,
+    or JSON with ?format=json.
+    """
+    def get(self, request, pk, *args, **kwargs):
+        if not Post.objects.filter(pk=pk).exists():
+            raise Http404('No post found')
+        try:
+            page = comment_page(pk, cursor=request.GET.get('cursor'))
+        except InvalidCursor:
+            return HttpResponseBadRequest('Invalid cursor')
+
+        if request.GET.get('format') == 'json':
+            return JsonResponse({
+                'comments': [comment_to_json(comment) for comment in page],
+                'next_cursor': page.next_cursor,
+            })
+        response = render(request, 'BlogApp/partials/comment_list.html', {'comments': page})
+        response['X-Next-Cursor'] = page.next_cursor or ''
+        return response
+
 # --- Writer Panel Views (Protected) ---
 
 @method_decorator(login_and_writer_required, name='dispatch')
@@ -139,7 +323,9 @@ class PostUpdateView(View):
         form = PostForm(request.POST, request.FILES, instance=post)
         
         if form.is_valid():
-            form.save()
+            # Only write what the form edits: the vote and comment counters
+            # loaded with the post may have changed since.
+            form.save(commit=False).save(update_fields=[*PostForm._meta.fields, 'revision', 'updated_at'])
             return redirect('post_detail', pk=post.pk)
 
         context = {'form': form, 'type': 'Update'}
@@ -225,7 +411,11 @@ class MyPostsView(View):
     """
     def get(self, request, *args, **kwargs):
         # Filter posts where the author is the currently logged-in user
-        my_posts = Post.objects.filter(author=request.user).order_by('-created_at')
+        my_posts = (
+            Post.objects.filter(author=request.user)
+            .only('title', 'cover_image', 'cover_variants', 'created_at')
+            .order_by('-created_at')
+        )
         
         context = {
             'posts': my_posts
@@ -238,34 +428,21 @@ class PostVoteView(View):
     """
     Handles liking and disliking a post.
     A user can only like or dislike, not both.
+    AJAX callers (Accept: application/json) get the new counts back as JSON.
     """
     def post(self, request, pk, *args, **kwargs):
-        post = get_object_or_404(Post, pk=pk)
-        user = request.user
+        post = get_object_or_404(Post.objects.only('pk'), pk=pk)
         vote_type = request.POST.get('vote') # Will be 'like' or 'dislike'
 
-        if vote_type == 'like':
-            if user in post.likes.all():
-                # User already liked it, so remove the like
-                post.likes.remove(user)
-            else:
-                # Add the like
-                post.likes.add(user)
-                # If user had disliked it, remove the dislike
-                if user in post.dislikes.all():
-                    post.dislikes.remove(user)
-        
-        elif vote_type == 'dislike':
-            if user in post.dislikes.all():
-                # User already disliked it, so remove the dislike
-                post.dislikes.remove(user)
-            else:
-                # Add the dislike
-                post.dislikes.add(user)
-                # If user had liked it, remove the like
-                if user in post.likes.all():
-                    post.likes.remove(user)
+        if vote_type not in votes.VOTE_TYPES:
+            if wants_json(request):
+                return JsonResponse({'error': 'Unknown vote type'}, status=400)
+            return redirect('post_detail', pk=post.pk)
+
+        result = votes.toggle_vote(post.pk, request.user, vote_type)
 
+        if wants_json(request):
+            return JsonResponse(result.as_dict())
         # Redirect back to the post detail page
         return redirect('post_detail', pk=post.pk)
     
@@ -279,50 +456,15 @@ class ProfileView(View):
     Display and update the user's OWN profile.
     """
     def get(self, request, *args, **kwargs):
-        profile, created = Profile.objects.get_or_create(user=request.user)
-        
-        # --- CALCULATE STATS ---
-        # This is the code your editor says is missing
-        user_posts = Post.objects.filter(author=request.user)
-        post_count = user_posts.count()
-
-        stats = user_posts.annotate(
-            num_likes=Count('likes'),
-            num_comments=Count('comments')
-        ).aggregate(
-            total_likes=Sum('num_likes'),
-            total_comments=Sum('num_comments')
-        )
-        total_likes = stats['total_likes'] or 0
-        total_comments = stats['total_comments'] or 0
-        # --- END STATS CALCULATION ---
-        
-        # --- GET FOLLOWER STATS ---
-        follower_count = profile.followers.count()
-        following_count = profile.following.count()
-        # ---
-
         u_form = UserUpdateForm(instance=request.user)
-        p_form = ProfileUpdateForm(instance=profile)
-
-        context = {
-            'u_form': u_form,
-            'p_form': p_form,
-            'post_count': post_count,
-            'total_likes': total_likes,
-            'total_comments': total_comments,
-            'follower_count': follower_count,
-            'following_count': following_count
-        }
-        return render(request, 'BlogApp/profile.html', context)
+        p_form = ProfileUpdateForm(instance=request.profile)
+        return self.render_profile(request, u_form, p_form)
 
     def post(self, request, *args, **kwargs):
-        profile, created = Profile.objects.get_or_create(user=request.user)
-
         u_form = UserUpdateForm(request.POST, instance=request.user)
         p_form = ProfileUpdateForm(request.POST, 
                                    request.FILES, 
-                                   instance=profile)
+                                   instance=request.profile)
 
         if u_form.is_valid() and p_form.is_valid():
             u_form.save()
@@ -330,73 +472,104 @@ class ProfileView(View):
             messages.success(request, 'Your profile has been updated!')
             return redirect('profile')
         else:
-            # --- THIS IS THE FIX FROM BEFORE ---
-            # We must re-calculate all stats if the form is invalid
-            user_posts = Post.objects.filter(author=request.user)
-            post_count = user_posts.count()
-            
-            stats = user_posts.annotate(
-                num_likes=Count('likes'),
-                num_comments=Count('comments')
-            ).aggregate(
-                total_likes=Sum('num_likes'),
-                total_comments=Sum('num_comments')
-            )
-            total_likes = stats['total_likes'] or 0
-            total_comments = stats['total_comments'] or 0
-            
-            follower_count = profile.followers.count()
-            following_count = profile.following.count()
-            # --- END OF FIX ---
+            # Re-render with the errors (and the stats) if the form is invalid
+            return self.render_profile(request, u_form, p_form)
+
+    def render_profile(self, request, u_form, p_form):
+        context = {
+            'u_form': u_form,
+            'p_form': p_form,
+            # One row of precomputed totals (see stats.py)
+            'stats': stats.get_stats(request.user),
+            # Computed offline (see follows.py)
+            'suggestions': FollowSuggestion.objects.filter(user=request.user)
+                           .values_list('suggestions', flat=True).first() or [],
+        }
+        return render(request, 'BlogApp/profile.html', context)
+
+class FeedView(View):
+    """
+    Reader Panel: Atom feed (RSS with feed_type='rss') of the latest posts,
+    site-wide or by one author. ?full=1 includes whole posts instead of
+    excerpts, ?all=1 streams every post.
+    """
+    feed_type = 'atom'
+
+    async def get(self, request, username=None, *args, **kwargs):
+        author = None
+        if username is not None:
+            author = await aget_object_or_404(User.objects.only('username'), username=username)
+        return await syndication.feed_response(request, self.feed_type, author)
+
 
-            context = {
-                'u_form': u_form,
-                'p_form': p_form,
-                'post_count': post_count,
-                'total_likes': total_likes,
-                'total_comments': total_comments,
-                'follower_count': follower_count,
-                'following_count': following_count
-            }
-            return render(request, 'BlogApp/profile.html', context)
 class PublicProfileView(View):
     """
-    Display a read-only public profile for any user.
+    Display a read-only public profile for any user, with their newest
+    posts. Older posts are fetched with ?cursor= (and ?partial=1 for the
+    "load more" fragment).
     """
-    def get(self, request, username, *args, **kwargs):
-        # Find the user by their username
-        profile_user = get_object_or_404(User, username=username)
-        profile, created = Profile.objects.get_or_create(user=profile_user)
-        
-        # Get their posts
-        user_posts = Post.objects.filter(author=profile_user).order_by('-created_at')
-        
-        # Get their stats
-        post_count = user_posts.count()
-        stats = user_posts.annotate(num_likes=Count('likes')).aggregate(total_likes=Sum('num_likes'))
-        total_likes = stats['total_likes'] or 0
-        
-        # Get follower stats
-        follower_count = profile.followers.count()
-        following_count = profile.following.count()
-        
-        # Check if the logged-in user is following this profile
-        is_following = False
-        if request.user.is_authenticated:
-            # Check if the user's profile is in the logged-in user's 'following' list
-            is_following = request.user.profile.following.filter(user=profile_user).exists()
+    paginate_by = 10
+
+    async def get(self, request, username, *args, **kwargs):
+        viewer = await get_user_async(request)
+        # Find the user by their username; the profile comes in the same query
+        profile_user = await aget_object_or_404(User.objects.select_related('profile'), username=username)
+        try:
+            profile = profile_user.profile  # Created on signup
+        except Profile.DoesNotExist:
+            raise Http404('No profile found')
+        try:
+            user_posts = await apaginate_keyset(
+                Post.objects.filter(author=profile_user)
+                .only('title', 'cover_image', 'cover_variants', 'created_at', 'updated_at'),
+                cursor=request.GET.get('cursor'),
+                per_page=self.paginate_by,
+            )
+        except InvalidCursor:
+            return HttpResponseBadRequest('Invalid cursor')
+        post_versions = [(post.pk, post.updated_at) for post in user_posts]
+        last_modified = max([profile.updated_at, *(post.updated_at for post in user_posts)])
+
+        if request.GET.get('partial') or request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            context = {'profile_user': profile_user, 'posts': user_posts}
+            response = await conditional_response(
+                request, ('profile_posts', profile_user.pk, post_versions, user_posts.next_cursor),
+                last_modified,
+                lambda: sync_to_async(render)(request, 'BlogApp/partials/profile_posts.html', context),
+            )
+            response['X-Next-Cursor'] = user_posts.next_cursor or ''
+            patch_vary_headers(response, ('X-Requested-With',))
+            return response
 
+        author_stats = await stats.aget_stats(profile_user)
+        is_following = await self.is_following(viewer, profile_user)
         context = {
             'profile_user': profile_user, # The user we are looking at
             'profile': profile,        # Their profile
-            'posts': user_posts,
-            'post_count': post_count,
-            'total_likes': total_likes,
-            'follower_count': follower_count,
-            'following_count': following_count,
+            'posts': user_posts,       # One KeysetPage of their posts
+            'stats': author_stats, # Their precomputed totals
             'is_following': is_following
         }
-        return render(request, 'BlogApp/public_profile.html', context)
+        parts = (
+            'profile', profile_user.pk, profile_user.username, profile_user.first_name,
+            profile_user.last_name, profile.updated_at, is_following,
+            [getattr(author_stats, field) for field in stats.STAT_FIELDS],
+            post_versions, user_posts.next_cursor,
+        )
+        response = await conditional_response(
+            request, parts, last_modified,
+            lambda: sync_to_async(render)(request, 'BlogApp/public_profile.html', context),
+            csrf=True,
+        )
+        patch_vary_headers(response, ('X-Requested-With',))
+        return response
+
+    async def is_following(self, viewer, profile_user):
+        if not viewer.is_authenticated:
+            return False
+        return await Profile.following.through.objects.filter(
+            from_profile__user=viewer, to_profile__user=profile_user
+        ).aexists()
 
 
 # --- ADD THIS NEW VIEW (FOLLOW/UNFOLLOW LOGIC) ---
@@ -407,22 +580,19 @@ class FollowView(View):
     """
     def post(self, request, username, *args, **kwargs):
         # User to follow
-        user_to_toggle = get_object_or_404(User, username=username)
-        
-        # Logged-in user's profile
-        current_user_profile = request.user.profile
+        user_to_toggle = get_object_or_404(User.objects.select_related('profile'), username=username)
         
         # Prevent following yourself
         if user_to_toggle == request.user:
             return redirect('public_profile', username=username)
 
-        # Check if we are already following this user's profile
-        if current_user_profile.following.filter(user=user_to_toggle).exists():
-            # If yes, unfollow
-            current_user_profile.following.remove(user_to_toggle.profile)
-        else:
-            # If no, follow
-            current_user_profile.following.add(user_to_toggle.profile)
+        with transaction.atomic():
+            if follows.toggle_follow(request.user, user_to_toggle):
+                # Followed: pull their recent posts into our timeline
+                feed.schedule_backfill(request.user, user_to_toggle)
+            else:
+                # Unfollowed: drop their posts from our timeline
+                feed.prune(request.user, user_to_toggle)
             
         return redirect('public_profile', username=username)
     
@@ -432,7 +602,7 @@ class CheckUsernameView(View):
     """
     This view is called by JavaScript to check if a username is available.
     """
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         # Get the username from the
         # URL (e.g., /check-username/?username=alex)
         username = request.GET.get('username', None)
@@ -440,8 +610,9 @@ class CheckUsernameView(View):
         if not username:
             return JsonResponse({'error': 'Username not provided'}, status=400)
 
-        # Check if a user with this username already exists (case-insensitive)
-        is_available = not User.objects.filter(username__iexact=username).exists()
+        # Check if a user with this username already exists (case-insensitive).
+        # Most answers come from the in-memory filter without a query.
+        is_available = await usernames.ais_username_available(username)
         
         # Return the result as JSON
         return JsonResponse({'is_available': is_available})
@@ -452,24 +623,27 @@ class CheckUsernameView(View):
 class SearchView(View):
     """
     Handles the search query and displays a results page.
+    Results come from the full-text index (see search.py), best match first.
     """
-    def get(self, request, *args, **kwargs):
-        # Get the search query from the URL (e.g., /search/?q=myquery)
-        query = request.GET.get('q', '')
-        
+    paginate_by = 10
+
+    async def get(self, request, *args, **kwargs):
+        await get_user_async(request)
+        # Get the search query from the URL (e.g., /search/?q=myquery&page=2)
+        query = request.GET.get('q', '').strip()
+        try:
+            page = int(request.GET.get('page', 1))
+        except ValueError:
+            page = 1
+
         results = [] # Start with an empty list
 
         if query:
-            # If a query exists, search the Post model
-            # Q() objects allow us to use OR logic
-            # __icontains = case-insensitive "contains"
-            results = Post.objects.filter(
-                Q(title__icontains=query) |
-                Q(content__icontains=query)
-            ).distinct().order_by('-created_at')
+            # The index is queried with raw SQL, which has no async API.
+            results = await sync_to_async(search.search_posts)(query, page=page, per_page=self.paginate_by)
         
         context = {
-            'results': results, # The list of posts found
+            'results': results, # The ranked hits for this page
             'query': query      # The original search term
         }
-        return render(request, 'BlogApp/search_results.html', context)
\ No newline at end of file
+        return await sync_to_async(render)(request, 'BlogApp/search_results.html', context)
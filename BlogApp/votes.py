@@ -0,0 +1,136 @@
+"""
+Like/dislike voting.
+
+Votes are rows in the Post.likes / Post.dislikes through tables. Their
+unique (post, user) index turns "has this user voted?" into a single index
+probe, however many votes a post has. Post.like_count / dislike_count
+mirror the row counts and are adjusted with F() expressions in the same
+transaction as the row changes.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.dispatch import Signal
+from django.utils import timezone
+
+from . import trending
+from .models import Post
+from .trending import SCORE_FIELDS
+
+LIKE = 'like'
+DISLIKE = 'dislike'
+VOTE_TYPES = (LIKE, DISLIKE)
+
+# Sent inside the vote transaction after the counters change.
+# Arguments: post_id, user_id, vote (the user's vote now: 'like', 'dislike' or None),
+# deltas (dict of counter field -> change), counts (the post's SCORE_FIELDS
+# after the change).
+vote_changed = Signal()
+
+_COUNT_FIELDS = {LIKE: 'like_count', DISLIKE: 'dislike_count'}
+
+
+def _votes(vote_type):
+    through = Post.likes.through if vote_type == LIKE else Post.dislikes.through
+    return through.objects
+
+
+class VoteResult:
+    def __init__(self, vote, like_count, dislike_count):
+        self.vote = vote
+        self.like_count = like_count
+        self.dislike_count = dislike_count
+
+    def as_dict(self):
+        return {
+            'vote': self.vote,
+            'liked': self.vote == LIKE,
+            'disliked': self.vote == DISLIKE,
+            'like_count': self.like_count,
+            'dislike_count': self.dislike_count,
+        }
+
+
+def get_user_vote(post, user):
+    """Return 'like', 'dislike' or None for this user's vote on ``post``."""
+    if not user.is_authenticated:
+        return None
+    for vote_type in VOTE_TYPES:
+        if _votes(vote_type).filter(post_id=post.pk, user_id=user.pk).exists():
+            return vote_type
+    return None
+
+
+async def aget_user_vote(post_id, user):
+    """Async version of get_user_vote() that takes the post's id."""
+    if not user.is_authenticated:
+        return None
+    for vote_type in VOTE_TYPES:
+        if await _votes(vote_type).filter(post_id=post_id, user_id=user.pk).aexists():
+            return vote_type
+    return None
+
+
+def toggle_vote(post_id, user, vote_type):
+    """
+    Toggle ``user``'s like or dislike on a post.
+
+    Voting the same way twice removes the vote; voting the other way
+    replaces it. Runs as one transaction and returns a VoteResult.
+    """
+    if vote_type not in VOTE_TYPES:
+        raise ValueError(f'Unknown vote type: {vote_type!r}')
+    opposite = DISLIKE if vote_type == LIKE else LIKE
+    deltas = {}
+
+    with transaction.atomic():
+        removed, _ = _votes(vote_type).filter(post_id=post_id, user_id=user.pk).delete()
+        if removed:
+            deltas[_COUNT_FIELDS[vote_type]] = -1
+            current = None
+        else:
+            try:
+                with transaction.atomic():
+                    _votes(vote_type).create(post_id=post_id, user_id=user.pk)
+                deltas[_COUNT_FIELDS[vote_type]] = 1
+            except IntegrityError:
+                # A concurrent request (double click) already added this vote.
+                pass
+            removed, _ = _votes(opposite).filter(post_id=post_id, user_id=user.pk).delete()
+            if removed:
+                deltas[_COUNT_FIELDS[opposite]] = -1
+            current = vote_type
+
+        if deltas:
+            Post.objects.filter(pk=post_id).update(
+                revision=F('revision') + 1,
+                updated_at=timezone.now(),
+                **{field: F(field) + delta for field, delta in deltas.items()}
+            )
+        counts = Post.objects.filter(pk=post_id).values(*SCORE_FIELDS).get()
+        if deltas:
+            vote_changed.send(sender=Post, post_id=post_id, user_id=user.pk,
+                              vote=current, deltas=deltas, counts=counts)
+
+    return VoteResult(current, counts['like_count'], counts['dislike_count'])
+
+
+def forget_votes_of(user_id):
+    """
+    Take a user's votes off the counters of the posts they voted on, before
+    deleting the user cascades the vote rows (which sends no signals).
+    Posts by the user themselves are left alone; they are deleted too.
+    Like any vote, this bumps the revision and rescores the posts.
+    """
+    now = timezone.now()
+    changed = set()
+    for vote_type in VOTE_TYPES:
+        field = _COUNT_FIELDS[vote_type]
+        voted = list(
+            Post.objects.filter(pk__in=_votes(vote_type).filter(user_id=user_id).values('post_id'))
+            .exclude(author_id=user_id).values_list('pk', flat=True)
+        )
+        Post.objects.filter(pk__in=voted).update(
+            revision=F('revision') + 1, updated_at=now, **{field: F(field) - 1}
+        )
+        changed.update(voted)
+    trending.rescore(changed)
@@ -0,0 +1,32 @@
+"""
+Gunicorn settings for serving the ASGI app with uvicorn workers:
+
+    gunicorn -c gunicorn_asgi.py myproject.asgi:application
+
+Each worker runs an event loop. While the async views (the public list,
+detail, search, profile and username-check pages) wait on the database
+or on a slow client, they don't hold a thread, so one worker can keep
+many connections open. WEB_CONCURRENCY sets the number of worker
+processes; roughly one per CPU core is enough.
+
+Single process, for local testing:
+
+    uvicorn myproject.asgi:application --reload
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'uvicorn_worker.UvicornWorker'
+
+# Idle keep-alive connections cost almost nothing on an event loop.
+keepalive = 75
+# Restart workers that stop answering, and give in-flight requests time on shutdown.
+timeout = 60
+graceful_timeout = 30
+# Recycle workers now and then to cap memory growth.
+max_requests = 10000
+max_requests_jitter = 1000
+
+accesslog = '-'
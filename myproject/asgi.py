@@ -2,6 +2,9 @@
 ASGI config for myproject project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with uvicorn workers under gunicorn (see gunicorn_asgi.py)::
+
+    gunicorn -c gunicorn_asgi.py myproject.asgi:application
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -14,3 +17,26 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
 
 application = get_asgi_application()
+
+# Warm the username filter before the first request (see wsgi.py).
+import threading  # noqa: E402
+
+from django.db import DatabaseError, connections  # noqa: E402
+
+from BlogApp import usernames  # noqa: E402
+
+
+def _warm():
+    try:
+        usernames.warm()
+    except DatabaseError:
+        pass
+    finally:
+        connections.close_all()
+
+
+# uvicorn imports this module inside its event loop, where the ORM refuses
+# to run queries, so the filter is built in a thread of its own.
+_warmer = threading.Thread(target=_warm)
+_warmer.start()
+_warmer.join()
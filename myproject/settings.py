@@ -25,13 +25,22 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     
     # --- ADD WHITENOISE HERE (Right after SecurityMiddleware) ---
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # (async-capable subclass, so ASGI requests don't queue behind it)
+    'BlogApp.middleware.AsyncWhiteNoiseMiddleware',
     # ------------------------------------------------------------
+    # Uploaded images under MEDIA_URL, served the same way.
+    'BlogApp.middleware.MediaMiddleware',
     
+    # Per-request SQL recording; inactive unless DEBUG and BLOG_QUERY_INSPECTION.
+    'BlogApp.querybudget.QueryInspectionMiddleware',
+    # Routes safe requests' reads to the replica; inactive without one.
+    'BlogApp.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # request.profile, loaded on first use.
+    'BlogApp.middleware.IdentityMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -48,6 +57,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'BlogApp.identity.context_processor',
             ],
         },
     },
@@ -64,6 +74,119 @@ DATABASES = {
     )
 }
 
+# --- READ REPLICA ---
+# Set REPLICA_DATABASE_URL to serve reads of GET/HEAD requests from a
+# replica (see BlogApp/routers.py). Clients that just wrote something read
+# from the primary for BLOG_READ_YOUR_WRITES_SECONDS.
+REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL')
+if REPLICA_DATABASE_URL:
+    DATABASES['replica'] = dj_database_url.parse(REPLICA_DATABASE_URL, conn_max_age=600)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['BlogApp.routers.PrimaryReplicaRouter']
+BLOG_READ_YOUR_WRITES_SECONDS = 15
+
+# --- CACHE ---
+# Per-process memory cache by default; set REDIS_URL to share one cache
+# between all workers.
+if 'REDIS_URL' in os.environ:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# How long rendered post fragments stay cached (seconds). Keys include the
+# post's revision, so edits never serve stale HTML.
+BLOG_FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# --- FOLLOWING TIMELINE ---
+# Authors with more followers than this are merged into timelines at read
+# time instead of being copied into every follower's feed on publish.
+BLOG_FEED_FANOUT_LIMIT = 10000
+# How many of an author's recent posts are copied into a reader's feed on follow.
+BLOG_FEED_BACKFILL = 100
+
+# --- ATOM/RSS FEEDS ---
+# Entries in /feed/ and /user/<username>/feed/ (?all=1 streams every post).
+BLOG_SYNDICATION_ENTRIES = 20
+# Feeds carry excerpts unless this is set or the reader asks for ?full=1.
+BLOG_SYNDICATION_FULL_CONTENT = False
+# Rendered feeds are cached under their version, so this only bounds memory.
+BLOG_SYNDICATION_CACHE_TIMEOUT = 60 * 60 * 24
+# Seconds feed readers and proxies may reuse a feed without revalidating it.
+BLOG_SYNDICATION_MAX_AGE = 60 * 5
+
+# --- TRENDING ---
+# A post's trending score is
+#   (likes - dislikes + BLOG_TRENDING_COMMENT_WEIGHT * comments) / (age in hours + 2) ** BLOG_TRENDING_GRAVITY
+# Higher gravity favours newer posts. Scores are refreshed by `manage.py
+# decay_trending`; posts older than BLOG_TRENDING_MAX_AGE_DAYS score 0.
+BLOG_TRENDING_GRAVITY = 1.8
+BLOG_TRENDING_COMMENT_WEIGHT = 2
+BLOG_TRENDING_MAX_AGE_DAYS = 30
+
+# --- SEARCH ---
+# Deepest results page served; later ?page= values show this page. Keeps the
+# OFFSET of the ranked query bounded (and inside SQLite's integer range).
+BLOG_SEARCH_MAX_PAGE = 100
+
+# --- WHO TO FOLLOW ---
+# Suggestions stored per user by `manage.py compute_follow_suggestions`.
+BLOG_FOLLOW_SUGGESTIONS = 10
+
+# --- QUERY BUDGETS ---
+# Set BLOG_QUERY_INSPECTION (with DEBUG) to log N+1 patterns and budget
+# overruns per request (see BlogApp/querybudget.py). Tests enforce the
+# budgets regardless.
+BLOG_QUERY_INSPECTION = DEBUG and 'BLOG_QUERY_INSPECTION' in os.environ
+# The same query shape this many times in one request is reported as N+1.
+BLOG_N_PLUS_ONE_THRESHOLD = 3
+# Most queries a request to each URL name may run, including session and user
+# lookups but not transaction control (BEGIN, SAVEPOINT, ...).
+BLOG_QUERY_BUDGETS = {
+    'post_list': 3,
+    'trending': 3,
+    'timeline': 5,
+    'my_posts': 3,
+    'post_detail': 6,
+    'post_comments': 2,
+    'search_results': 4,
+    'site_feed': 2,
+    'site_feed_rss': 2,
+    'author_feed': 3,
+    'author_feed_rss': 3,
+    'public_profile': 7,
+    'profile': 4,
+    'create_post': 2,
+    'update_post': 4,
+    'delete_post': 4,
+    'check_username': 2,
+    'post_vote': 10,
+    'follow_user': 11,
+    'register': 2,
+    'login': 2,
+}
+
+# --- USERNAME CHECKS ---
+# Seconds between rebuilds of the per-process username filter, and how long
+# "might be taken" answers for the registration form are cached.
+BLOG_USERNAME_FILTER_REFRESH = 60 * 5
+BLOG_USERNAME_CACHE_TTL = 30
+
+# Loads the profile together with the session's user. ModelBackend stays
+# so sessions logged in before the switch remain valid.
+AUTHENTICATION_BACKENDS = [
+    'BlogApp.identity.ProfileBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     { 'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator', },
     { 'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator', },
@@ -79,13 +202,54 @@ USE_TZ = True
 # --- STATIC FILES (CSS) ---
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
-# This enables WhiteNoise to serve your CSS
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# collectstatic gives every file a content-hashed name and writes gzip and
+# Brotli copies beside it; WhiteNoise serves the hashed names with
+# far-future, immutable cache headers. In DEBUG (runserver and tests, which
+# never run collectstatic) files are served unhashed from the app dirs.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+    # Cover images and profile pictures: stored once per distinct content,
+    # under MEDIA_ROOT/blobs/ (see BlogApp/media.py).
+    'media': {'BACKEND': 'BlogApp.storage.ContentAddressedStorage'},
+}
 
 # --- MEDIA FILES (Images) ---
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Parallel workers used by `manage.py generate_image_variants`.
+BLOG_IMAGE_WORKERS = 2
+# MediaMiddleware serves uploads. Content-addressed ones are cached forever;
+# the rest (resized variants, the default profile picture) this many seconds.
+BLOG_MEDIA_MAX_AGE = 60 * 60 * 24
+# Behind nginx, let it send the files: set this to an `internal` location
+# aliased to MEDIA_ROOT, e.g. /internal-media/ for
+#     location /internal-media/ { internal; alias /app/media/; }
+BLOG_MEDIA_ACCEL_REDIRECT = os.environ.get('BLOG_MEDIA_ACCEL_REDIRECT', '')
+# Behind Apache (mod_xsendfile) or lighttpd: send X-Sendfile headers instead.
+BLOG_MEDIA_X_SENDFILE = 'BLOG_MEDIA_X_SENDFILE' in os.environ
+# `manage.py gc_media` keeps unreferenced uploads younger than this many
+# hours: the post or profile that will use them may not be saved yet.
+BLOG_MEDIA_GC_GRACE_HOURS = 24
+
+# --- BACKGROUND TASKS ---
+# Queued tasks are run by `manage.py run_tasks`, deployed as a service of its
+# own. In development (DEBUG, unless BLOG_TASKS_WORKER is set) they also run
+# in-process right after the request's transaction commits, through the
+# same claim/retry path as the worker.
+BLOG_TASKS_EAGER = DEBUG and 'BLOG_TASKS_WORKER' not in os.environ
+# Seconds before the first retry of a failed task (doubled on each attempt).
+BLOG_TASKS_RETRY_DELAY = 10
+# Running tasks not finished after this many seconds are assumed lost and requeued.
+BLOG_TASKS_STALE_AFTER = 60 * 10
+# Seconds between checks for such tasks while workers run.
+BLOG_TASKS_REQUEUE_INTERVAL = 60
+BLOG_TASKS_RETENTION_DAYS = 7
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_REDIRECT_URL = 'post_list'
@@ -14,3 +14,14 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
 
 application = get_wsgi_application()
+
+# Warm the username filter before the first request; if the database isn't
+# reachable yet it is built lazily on the first check instead.
+from django.db import DatabaseError  # noqa: E402
+
+from BlogApp import usernames  # noqa: E402
+
+try:
+    usernames.warm()
+except DatabaseError:
+    pass